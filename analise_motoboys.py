@@ -0,0 +1,102 @@
+"""
+Análises históricas do Sistema de Controle de Motoboys
+
+Trabalha sobre o resumo diário pré-agregado (uma linha por data, motoboy,
+tipo e período), então qualquer intervalo de datas custa uma passada
+vetorizada do pandas sobre poucas linhas por dia, não uma varredura da
+tabela de registros.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Rótulo exibido → frequência de período do pandas (semanas de segunda a domingo)
+GRANULARIDADES = {"Dia": "D", "Semana": "W-SUN", "Mês": "M"}
+
+COLUNAS_RESUMO = ["data", "nome", "tipo", "periodo", "registros", "entregas"]
+
+
+def montar_frame_resumo(linhas: List[Dict], config: Dict) -> pd.DataFrame:
+    """Frame do resumo diário com o custo de cada linha pela configuração informada"""
+    df = pd.DataFrame(linhas, columns=COLUNAS_RESUMO)
+    df["data"] = pd.to_datetime(df["data"])
+    df["registros"] = df["registros"].astype(int)
+    df["entregas"] = df["entregas"].astype(int)
+
+    # Mesma regra do banco: uma diária por dia trabalhado para fixos, corrida por entrega
+    # para todos. Com mais de uma linha no dia (turnos), a diária é dividida entre elas
+    valor_diaria = float(config.get("valor_diaria", 0))
+    valor_corrida = float(config.get("valor_corrida", 0))
+    linhas_no_dia = df.groupby(["data", "nome", "tipo"])["tipo"].transform("size")
+    df["custo"] = np.where(df["tipo"] == "Fixo", valor_diaria / linhas_no_dia, 0.0) + df["entregas"] * valor_corrida
+    return df
+
+
+def _custo_por_entrega(custo: pd.Series, entregas: pd.Series) -> pd.Series:
+    return (custo / entregas.replace(0, np.nan)).astype(float)
+
+
+def resumo_periodo(df: pd.DataFrame) -> Dict:
+    """Totais de um intervalo"""
+    entregas = int(df["entregas"].sum())
+    custo = float(df["custo"].sum())
+    return {
+        "total_entregas": entregas,
+        "custo_total": custo,
+        "motoboys": int(df["nome"].nunique()),
+        "dias": int(df["data"].nunique()),
+        "custo_por_entrega": custo / entregas if entregas else 0.0
+    }
+
+
+def serie_temporal(df: pd.DataFrame, granularidade: str = "Dia") -> pd.DataFrame:
+    """Entregas, custo, motoboys ativos e custo por entrega por dia, semana ou mês"""
+    freq = GRANULARIDADES[granularidade]
+    inicio = df["data"].dt.to_period(freq).dt.start_time
+
+    serie = df.groupby(inicio).agg(
+        entregas=("entregas", "sum"),
+        custo=("custo", "sum"),
+        motoboys=("nome", "nunique")
+    )
+
+    # Períodos sem registro aparecem zerados, para o gráfico não pular datas
+    if not serie.empty:
+        completo = pd.period_range(serie.index.min(), serie.index.max(), freq=freq).start_time
+        serie = serie.reindex(completo, fill_value=0)
+
+    serie.index.name = "inicio"
+    serie["custo_por_entrega"] = _custo_por_entrega(serie["custo"], serie["entregas"])
+    return serie.reset_index()
+
+
+def tendencia_semanal(df: pd.DataFrame) -> pd.DataFrame:
+    """Totais por semana com a variação percentual em relação à semana anterior"""
+    semanas = serie_temporal(df, "Semana")
+    semanas["variacao_entregas"] = semanas["entregas"].pct_change().replace([np.inf, -np.inf], np.nan) * 100
+    semanas["variacao_custo"] = semanas["custo"].pct_change().replace([np.inf, -np.inf], np.nan) * 100
+    return semanas
+
+
+def custo_por_entrega_motoboy(df: pd.DataFrame, granularidade: str = "Semana") -> pd.DataFrame:
+    """Histórico de custo por entrega de cada motoboy"""
+    inicio = df["data"].dt.to_period(GRANULARIDADES[granularidade]).dt.start_time.rename("inicio")
+    historico = df.groupby([inicio, df["nome"]]).agg(
+        entregas=("entregas", "sum"),
+        custo=("custo", "sum")
+    ).reset_index()
+    historico["custo_por_entrega"] = _custo_por_entrega(historico["custo"], historico["entregas"])
+    return historico
+
+
+def ranking_motoboys(df: pd.DataFrame) -> pd.DataFrame:
+    """Consolidado por motoboy no intervalo, do que mais entregou para o que menos entregou"""
+    ranking = df.groupby(["nome", "tipo"]).agg(
+        dias_trabalhados=("data", "nunique"),
+        total_entregas=("entregas", "sum"),
+        custo=("custo", "sum")
+    ).reset_index()
+    ranking["custo_por_entrega"] = _custo_por_entrega(ranking["custo"], ranking["total_entregas"])
+    return ranking.sort_values(["total_entregas", "nome"], ascending=[False, True]).reset_index(drop=True)
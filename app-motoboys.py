@@ -9,11 +9,17 @@ Versão 2026 - Otimizada para Streamlit Cloud
 - Pandas/Plotly atualizados
 """
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, date
-import database as db
+from datetime import datetime, date, timedelta
+import zipfile
+import analise_motoboys as analise
+import assistente_motoboys as assistente
+import consultas_assistente as consultas
+import dados_motoboys as dados
+from google import genai
 import utils
 import ai_assistant
 
@@ -66,6 +72,384 @@ except Exception as e:
     """)
     st.stop()
 
+LIMIAR_MODO_COMPACTO = 20  # Acima disso, os registros de hoje abrem em tabela
+OPCOES_TAMANHO_PAGINA = [25, 50, 100]
+DIAS_ANALISE_PADRAO = 90
+MAX_MOTOBOYS_GRAFICO = 8
+INTERVALO_FEED = 3  # Segundos entre leituras do número do feed de alterações (em memória, sem consultar o banco)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def preparar_relatorio(relatorio: list) -> tuple:
+    """
+    Monta as tabelas e totalizadores do relatório uma vez por versão dos dados.
+
+    Returns:
+        (df_relatorio, df_display, totais)
+    """
+    df_relatorio = pd.DataFrame(relatorio)
+
+    # Formatar coluna de valor devido
+    df_relatorio['Valor Devido'] = df_relatorio['valor_devido'].map(utils.formatar_moeda)
+
+    # Renomear colunas para exibição
+    df_display = df_relatorio[[
+        'nome', 'tipo', 'dias_trabalhados', 'total_entregas', 'Valor Devido'
+    ]].rename(columns={
+        'nome': 'Motoboy',
+        'tipo': 'Tipo',
+        'dias_trabalhados': 'Dias Trabalhados',
+        'total_entregas': 'Total Entregas'
+    })
+
+    total_entregas = int(df_relatorio['total_entregas'].sum())
+    totais = {
+        'total_entregas': total_entregas,
+        'valor_devido': float(df_relatorio['valor_devido'].sum()),
+        'media_entregas': total_entregas / len(df_relatorio)
+    }
+    return df_relatorio, df_display, totais
+
+@st.cache_resource
+def obter_cache_respostas() -> assistente.CacheRespostas:
+    """Cache de respostas do assistente, compartilhado entre as sessões"""
+    return assistente.CacheRespostas()
+
+@st.cache_resource
+def obter_cliente_gemini() -> genai.Client:
+    """Cliente do SDK do Gemini, com a mesma chave `[google] api_key` exigida na verificação dos secrets"""
+    return genai.Client(api_key=st.secrets["google"]["api_key"])
+
+def limpar_chat():
+    st.session_state.chat_history = []
+
+@st.fragment
+def assistente_ia():
+    """Chat com o assistente; perguntas reexecutam só esta seção e a resposta aparece em fluxo"""
+    # Consultas cacheadas: não vão ao banco se os dados não mudaram
+    config_atual = dados.buscar_configuracao_ativa()
+    kpis_hoje = dados.calcular_kpis_dia(date.today())
+    relatorio_semanal = dados.gerar_relatorio_semanal(date.today())
+
+    col_chat, col_sugestoes = st.columns([2, 1])
+
+    pergunta_pendente = None
+
+    with col_sugestoes:
+        st.write("**💡 Perguntas Sugeridas:**")
+
+        perguntas_sugeridas = ai_assistant.sugerir_perguntas()
+
+        for pergunta in perguntas_sugeridas:
+            if st.button(pergunta, key=f"sugestao_{pergunta[:20]}", use_container_width=True):
+                pergunta_pendente = pergunta
+
+    with col_chat:
+        st.write("**💬 Chat com Assistente:**")
+
+        # Container para o chat
+        chat_container = st.container()
+
+        with chat_container:
+            # Exibir histórico de mensagens
+            for msg in st.session_state.chat_history:
+                if msg["role"] == "user":
+                    st.chat_message("user").write(msg["message"])
+                else:
+                    st.chat_message("assistant").write(msg["message"])
+
+        # Input do usuário
+        user_input = st.chat_input("Digite sua pergunta sobre os dados...")
+        pergunta_pendente = user_input or pergunta_pendente
+
+        if pergunta_pendente:
+            st.session_state.chat_history.append({
+                "role": "user",
+                "message": pergunta_pendente
+            })
+
+            with chat_container:
+                st.chat_message("user").write(pergunta_pendente)
+
+                # Tokens são exibidos conforme chegam; sem reexecutar o script no final
+                with st.chat_message("assistant"):
+                    resposta = st.write_stream(assistente.responder_em_fluxo(
+                        pergunta_pendente,
+                        kpis_hoje,
+                        relatorio_semanal,
+                        config_atual,
+                        cliente=obter_cliente_gemini(),
+                        cache=obter_cache_respostas(),
+                        ferramentas=consultas.FERRAMENTAS,
+                        versao=str(dados.obter_feed().ultimo_seq)
+                    ))
+
+            st.session_state.chat_history.append({
+                "role": "assistant",
+                "message": resposta
+            })
+
+        # Botão para limpar chat
+        if st.session_state.chat_history:
+            st.button("🗑️ Limpar Chat", use_container_width=True, on_click=limpar_chat)
+
+def reexecutar_painel():
+    """Reexecuta só o fragmento atual; numa execução completa, o app inteiro"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+@st.fragment(run_every=INTERVALO_FEED)
+def acompanhar_feed():
+    """
+    Confere só o número de sequência do feed; os painéis abaixo não têm
+    `run_every` e são redesenhados uma vez, numa reexecução do app, quando
+    algum registro muda (nesta ou em outra sessão).
+    """
+    if dados.obter_feed().ultimo_seq != st.session_state.seq_exibido:
+        st.rerun()
+
+@st.fragment
+def indicadores_hoje(config: dict):
+    """KPIs de hoje a partir do estado local, com as mutações da aba operacional"""
+    kpis = dados.obter_estado_dia().kpis(config)
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+
+    with col1:
+        st.metric(
+            label="📦 Total Entregas",
+            value=kpis['total_entregas']
+        )
+
+    with col2:
+        st.metric(
+            label="🏍️ Total Motoboys",
+            value=kpis['total_motoboys']
+        )
+
+    with col3:
+        st.metric(
+            label="📊 Média Entregas/Moto",
+            value=f"{kpis['media_entregas_moto']:.1f}"
+        )
+
+    with col4:
+        st.metric(
+            label="💰 Custo Total",
+            value=utils.formatar_moeda(kpis['custo_total'])
+        )
+
+    with col5:
+        st.metric(
+            label="💵 Custo/Entrega",
+            value=utils.formatar_moeda(kpis['custo_medio_entrega'])
+        )
+
+@st.fragment
+def relatorio_semana():
+    """Relatório da semana; redesenhado quando o feed registra alguma mutação"""
+    relatorio = dados.gerar_relatorio_semanal(date.today())
+
+    if relatorio:
+        df_relatorio, df_display, totais_semana = preparar_relatorio(relatorio)
+
+        # Exibir tabela
+        st.dataframe(
+            df_display,
+            use_container_width=True,
+            hide_index=True
+        )
+
+        # Gráficos
+        col_graf1, col_graf2 = st.columns(2)
+
+        with col_graf1:
+            # Gráfico de entregas por motoboy
+            fig_entregas = px.bar(
+                df_relatorio,
+                x='nome',
+                y='total_entregas',
+                color='tipo',
+                title='Entregas por Motoboy (Semana)',
+                labels={'nome': 'Motoboy', 'total_entregas': 'Entregas', 'tipo': 'Tipo'},
+                color_discrete_map={'Fixo': '#1f77b4', 'Freelancer': '#ff7f0e'}
+            )
+            st.plotly_chart(fig_entregas, use_container_width=True)
+
+        with col_graf2:
+            # Gráfico de valores devidos
+            df_fixos = df_relatorio[df_relatorio['tipo'] == 'Fixo']
+
+            if not df_fixos.empty:
+                fig_valores = px.bar(
+                    df_fixos,
+                    x='nome',
+                    y='valor_devido',
+                    title='Valores a Pagar - Motoboys Fixos (Semana)',
+                    labels={'nome': 'Motoboy', 'valor_devido': 'Valor (R$)'},
+                    color_discrete_sequence=['#2ca02c']
+                )
+                st.plotly_chart(fig_valores, use_container_width=True)
+            else:
+                st.info("Nenhum motoboy fixo com valores a pagar esta semana.")
+
+        # Totalizadores
+        col_total1, col_total2, col_total3 = st.columns(3)
+
+        with col_total1:
+            st.metric("📦 Total Entregas (Semana)", totais_semana['total_entregas'])
+
+        with col_total2:
+            st.metric("💰 Total a Pagar (Semana)", utils.formatar_moeda(totais_semana['valor_devido']))
+
+        with col_total3:
+            st.metric("📊 Média Entregas/Motoboy (Semana)", f"{totais_semana['media_entregas']:.1f}")
+
+    else:
+        st.info("ℹ️ Nenhum registro encontrado para esta semana.")
+
+@st.fragment
+def analise_historica(config: dict):
+    """Análise de qualquer intervalo sobre o resumo diário; os filtros reexecutam só esta seção"""
+    hoje = date.today()
+
+    col_intervalo, col_granularidade = st.columns([2, 1])
+
+    with col_intervalo:
+        intervalo = st.date_input(
+            "Intervalo",
+            value=(hoje - timedelta(days=DIAS_ANALISE_PADRAO - 1), hoje),
+            max_value=hoje,
+            format="DD/MM/YYYY"
+        )
+
+    with col_granularidade:
+        granularidade = st.selectbox("Agrupar por", list(analise.GRANULARIDADES), index=1)
+
+    if len(intervalo) != 2:
+        st.info("ℹ️ Selecione a data final do intervalo.")
+        return
+
+    inicio, fim = intervalo
+
+    # Intervalo anterior de mesma duração, para as variações
+    fim_anterior = inicio - timedelta(days=1)
+    inicio_anterior = fim_anterior - (fim - inicio)
+
+    df_atual = analise.montar_frame_resumo(dados.buscar_resumo_diario(inicio, fim), config)
+    df_anterior = analise.montar_frame_resumo(dados.buscar_resumo_diario(inicio_anterior, fim_anterior), config)
+
+    if df_atual.empty:
+        st.info("ℹ️ Nenhum registro no intervalo selecionado.")
+        return
+
+    atual = analise.resumo_periodo(df_atual)
+    anterior = analise.resumo_periodo(df_anterior)
+
+    def variacao(chave: str):
+        if not anterior[chave]:
+            return None
+        return f"{(atual[chave] - anterior[chave]) / anterior[chave] * 100:+.1f}%"
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("📦 Entregas", f"{atual['total_entregas']:,}".replace(",", "."), variacao("total_entregas"))
+
+    with col2:
+        st.metric("💰 Custo", utils.formatar_moeda(atual['custo_total']), variacao("custo_total"), delta_color="inverse")
+
+    with col3:
+        st.metric(
+            "💵 Custo/Entrega",
+            utils.formatar_moeda(atual['custo_por_entrega']),
+            variacao("custo_por_entrega"),
+            delta_color="inverse"
+        )
+
+    with col4:
+        st.metric("🏍️ Motoboys Ativos", atual['motoboys'], variacao("motoboys"))
+
+    st.caption(
+        f"Variações em relação a {inicio_anterior.strftime('%d/%m/%Y')} – {fim_anterior.strftime('%d/%m/%Y')}"
+    )
+
+    col_graf1, col_graf2 = st.columns(2)
+
+    with col_graf1:
+        # Entregas (barras) e custo por entrega (linha) no tempo
+        serie = analise.serie_temporal(df_atual, granularidade)
+        fig_serie = go.Figure()
+        fig_serie.add_trace(go.Bar(x=serie['inicio'], y=serie['entregas'], name='Entregas', marker_color='#1f77b4'))
+        fig_serie.add_trace(go.Scatter(
+            x=serie['inicio'],
+            y=serie['custo_por_entrega'],
+            name='Custo/Entrega (R$)',
+            yaxis='y2',
+            mode='lines+markers',
+            line=dict(color='#2ca02c')
+        ))
+        fig_serie.update_layout(
+            title=f'Entregas e Custo por Entrega ({granularidade})',
+            yaxis=dict(title='Entregas'),
+            yaxis2=dict(title='R$', overlaying='y', side='right'),
+            legend=dict(orientation='h', y=-0.2)
+        )
+        st.plotly_chart(fig_serie, use_container_width=True)
+
+    with col_graf2:
+        # Variação semana contra semana
+        semanas = analise.tendencia_semanal(df_atual).dropna(subset=['variacao_entregas'])
+
+        if not semanas.empty:
+            fig_semanas = px.bar(
+                semanas,
+                x='inicio',
+                y='variacao_entregas',
+                title='Variação de Entregas Semana a Semana (%)',
+                labels={'inicio': 'Semana', 'variacao_entregas': 'Variação (%)'},
+                color=semanas['variacao_entregas'] >= 0,
+                color_discrete_map={True: '#2ca02c', False: '#d62728'}
+            )
+            fig_semanas.update_layout(showlegend=False)
+            st.plotly_chart(fig_semanas, use_container_width=True)
+        else:
+            st.info("Selecione ao menos duas semanas para ver a tendência.")
+
+    # Custo por entrega dos motoboys com mais entregas
+    ranking = analise.ranking_motoboys(df_atual)
+    principais = ranking['nome'].head(MAX_MOTOBOYS_GRAFICO).tolist()
+
+    historico = analise.custo_por_entrega_motoboy(df_atual[df_atual['nome'].isin(principais)], granularidade)
+    fig_historico = px.line(
+        historico,
+        x='inicio',
+        y='custo_por_entrega',
+        color='nome',
+        markers=True,
+        title=f'Custo por Entrega por Motoboy ({granularidade}, {len(principais)} com mais entregas)',
+        labels={'inicio': 'Período', 'custo_por_entrega': 'Custo/Entrega (R$)', 'nome': 'Motoboy'}
+    )
+    st.plotly_chart(fig_historico, use_container_width=True)
+
+    st.dataframe(
+        ranking.rename(columns={
+            'nome': 'Motoboy',
+            'tipo': 'Tipo',
+            'dias_trabalhados': 'Dias Trabalhados',
+            'total_entregas': 'Total Entregas',
+            'custo': 'Custo (R$)',
+            'custo_por_entrega': 'Custo/Entrega (R$)'
+        }),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Custo (R$)': st.column_config.NumberColumn(format="%.2f"),
+            'Custo/Entrega (R$)': st.column_config.NumberColumn(format="%.2f")
+        }
+    )
+
 # CSS customizado
 st.markdown("""
 <style>
@@ -98,88 +482,97 @@ if 'chat_history' not in st.session_state:
 if 'editando_registro' not in st.session_state:
     st.session_state.editando_registro = None
 
+# Número do feed lido antes dos dados: o que mudar depois dispara outra reexecução
+st.session_state.seq_exibido = dados.obter_feed().ultimo_seq
+acompanhar_feed()
+
 # Criar tabs principais
 tab_operacional, tab_gerencial = st.tabs(["📋 OPERACIONAL", "📊 GERENCIAL"])
 
 # ==================== ABA OPERACIONAL ====================
-with tab_operacional:
-    st.header("Gestão Operacional Diária")
+@st.fragment
+def lista_registros_hoje():
+    """Registros de hoje e edição; as alterações de outras sessões chegam pelo `acompanhar_feed`"""
+    estado = dados.obter_estado_dia()
 
-    col1, col2 = st.columns([1, 1])
+    st.subheader("📅 Registros de Hoje")
 
-    # Coluna 1: Formulário de Registro
-    with col1:
-        st.subheader("➕ Novo Registro")
+    # Falhas da última sincronização (alterações já desfeitas localmente)
+    for erro in estado.erros:
+        st.error(f"❌ {erro}")
+    estado.erros.clear()
 
-        with st.form("form_registro", clear_on_submit=True):
-            # Buscar lista de motoboys para autocomplete
-            lista_motoboys = db.buscar_nomes_motoboys()
+    registros_hoje = estado.listar()
 
-            # Campo nome com autocomplete
-            if lista_motoboys:
-                nome_selecionado = st.selectbox(
-                    "Nome do Motoboy",
-                    options=[""] + lista_motoboys + ["➕ Novo motoboy"],
-                    index=0
-                )
+    if registros_hoje:
+        # Dias movimentados abrem em modo compacto; depois vale a escolha do usuário
+        if "modo_compacto" not in st.session_state:
+            st.session_state.modo_compacto = len(registros_hoje) > LIMIAR_MODO_COMPACTO
 
-                if nome_selecionado == "➕ Novo motoboy":
-                    nome = st.text_input("Digite o nome do novo motoboy")
-                elif nome_selecionado == "":
-                    nome = st.text_input("Ou digite um nome")
-                else:
-                    nome = nome_selecionado
-            else:
-                nome = st.text_input("Nome do Motoboy")
+        modo_compacto = st.toggle(
+            "Modo compacto",
+            key="modo_compacto",
+            help="Tabela única, com editar/excluir na linha selecionada"
+        )
 
-            data_registro = st.date_input(
-                "Data",
-                value=date.today(),
-                format="DD/MM/YYYY"
+        if modo_compacto:
+            # Uma tabela paginada no lugar de um card com botões por registro
+            col_tamanho, col_pagina = st.columns(2)
+
+            with col_tamanho:
+                tamanho_pagina = st.selectbox("Linhas por página", OPCOES_TAMANHO_PAGINA, index=1)
+
+            total_paginas = max((len(registros_hoje) + tamanho_pagina - 1) // tamanho_pagina, 1)
+
+            with col_pagina:
+                pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+
+            inicio = (pagina - 1) * tamanho_pagina
+            registros_pagina = registros_hoje[inicio:inicio + tamanho_pagina]
+
+            df_pagina = pd.DataFrame([
+                {
+                    "Motoboy": f"{'🔧' if r['tipo'] == 'Fixo' else '🏍️'} {r['nome']}",
+                    "Período": f"{'☀️' if r['periodo'] == 'Manhã' else '🌙'} {r['periodo']}",
+                    "Entregas": r['entregas'],
+                    "": "⏳" if r['id'] < 0 else ""
+                }
+                for r in registros_pagina
+            ])
+
+            # A chave muda com as linhas da página, descartando seleções que apontariam para outro registro
+            selecao = st.dataframe(
+                df_pagina,
+                use_container_width=True,
+                hide_index=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key=f"tabela_hoje_{hash(tuple(r['id'] for r in registros_pagina))}"
             )
 
-            col_periodo, col_tipo = st.columns(2)
-
-            with col_periodo:
-                periodo = st.selectbox("Período", ["Manhã", "Noite"])
-
-            with col_tipo:
-                tipo = st.selectbox("Tipo", ["Fixo", "Freelancer"])
+            if selecao.selection.rows:
+                registro = registros_pagina[selecao.selection.rows[0]]
+                pendente = registro['id'] < 0
 
-            entregas = st.number_input(
-                "Número de Entregas",
-                min_value=0,
-                value=0,
-                step=1
-            )
+                col_edit, col_del = st.columns(2)
 
-            submitted = st.form_submit_button("✅ Registrar", use_container_width=True)
+                with col_edit:
+                    if st.button("✏️ Editar", key="edit_selecionado", disabled=pendente, use_container_width=True):
+                        st.session_state.editando_registro = registro
 
-            if submitted:
-                if nome and nome.strip():
-                    sucesso = db.inserir_registro(
-                        nome.strip(),
-                        data_registro,
-                        periodo,
-                        tipo,
-                        entregas
+                with col_del:
+                    st.button(
+                        "🗑️ Excluir",
+                        key="del_selecionado",
+                        disabled=pendente,
+                        use_container_width=True,
+                        on_click=estado.excluir,
+                        args=(registro['id'],)
                     )
+            else:
+                st.caption("Selecione uma linha para editar ou excluir.")
 
-                    if sucesso:
-                        st.success(f"✅ Registro de {nome} adicionado com sucesso!")
-                        st.rerun()
-                    else:
-                        st.error("❌ Erro ao adicionar registro. Verifique a conexão com o banco de dados.")
-                else:
-                    st.warning("⚠️ Por favor, preencha o nome do motoboy.")
-
-    # Coluna 2: Listagem do Dia
-    with col2:
-        st.subheader("📅 Registros de Hoje")
-
-        registros_hoje = db.buscar_registros_dia(date.today())
-
-        if registros_hoje:
+        else:
             # Exibir cada registro em um card
             for registro in registros_hoje:
                 with st.container():
@@ -196,21 +589,26 @@ with tab_operacional:
                     with col_actions:
                         col_edit, col_del = st.columns(2)
 
+                        # Registros ainda não confirmados pelo banco não têm id definitivo
+                        pendente = registro['id'] < 0
+
                         with col_edit:
-                            if st.button("✏️", key=f"edit_{registro['id']}", help="Editar"):
+                            if st.button("✏️", key=f"edit_{registro['id']}", help="Editar", disabled=pendente):
                                 st.session_state.editando_registro = registro
 
                         with col_del:
-                            if st.button("🗑️", key=f"del_{registro['id']}", help="Excluir"):
-                                if db.excluir_registro(registro['id']):
-                                    st.success("✅ Registro excluído!")
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Erro ao excluir registro.")
+                            st.button(
+                                "🗑️",
+                                key=f"del_{registro['id']}",
+                                help="Excluir",
+                                disabled=pendente,
+                                on_click=estado.excluir,
+                                args=(registro['id'],)
+                            )
 
                     st.divider()
-        else:
-            st.info("ℹ️ Nenhum registro encontrado para hoje.")
+    else:
+        st.info("ℹ️ Nenhum registro encontrado para hoje.")
 
     # Modal de edição
     if st.session_state.editando_registro:
@@ -219,67 +617,219 @@ with tab_operacional:
         st.divider()
         st.subheader("✏️ Editar Registro")
 
+        # Callbacks rodam antes da reexecução, que já desenha a lista atualizada
+        def salvar_edicao():
+            estado.atualizar(
+                registro['id'],
+                st.session_state.nome_edit,
+                st.session_state.data_edit,
+                st.session_state.periodo_edit,
+                st.session_state.tipo_edit,
+                st.session_state.entregas_edit
+            )
+            st.session_state.editando_registro = None
+
+        def cancelar_edicao():
+            st.session_state.editando_registro = None
+
         with st.form("form_edicao"):
-            nome_edit = st.text_input("Nome do Motoboy", value=registro['nome'])
+            st.text_input("Nome do Motoboy", value=registro['nome'], key="nome_edit")
 
-            data_edit = st.date_input(
+            st.date_input(
                 "Data",
                 value=datetime.strptime(registro['data'], '%Y-%m-%d').date(),
-                format="DD/MM/YYYY"
+                format="DD/MM/YYYY",
+                key="data_edit"
             )
 
             col_periodo_edit, col_tipo_edit = st.columns(2)
 
             with col_periodo_edit:
                 periodo_index = 0 if registro['periodo'] == "Manhã" else 1
-                periodo_edit = st.selectbox("Período", ["Manhã", "Noite"], index=periodo_index)
+                st.selectbox("Período", ["Manhã", "Noite"], index=periodo_index, key="periodo_edit")
 
             with col_tipo_edit:
                 tipo_index = 0 if registro['tipo'] == "Fixo" else 1
-                tipo_edit = st.selectbox("Tipo", ["Fixo", "Freelancer"], index=tipo_index)
+                st.selectbox("Tipo", ["Fixo", "Freelancer"], index=tipo_index, key="tipo_edit")
 
-            entregas_edit = st.number_input(
+            st.number_input(
                 "Número de Entregas",
                 min_value=0,
                 value=registro['entregas'],
-                step=1
+                step=1,
+                key="entregas_edit"
             )
 
             col_salvar, col_cancelar = st.columns(2)
 
             with col_salvar:
-                salvar = st.form_submit_button("💾 Salvar", use_container_width=True)
+                st.form_submit_button("💾 Salvar", use_container_width=True, on_click=salvar_edicao)
 
             with col_cancelar:
-                cancelar = st.form_submit_button("❌ Cancelar", use_container_width=True)
-
-            if salvar:
-                if db.atualizar_registro(
-                    registro['id'],
-                    nome_edit,
-                    data_edit,
-                    periodo_edit,
-                    tipo_edit,
-                    entregas_edit
-                ):
-                    st.success("✅ Registro atualizado com sucesso!")
-                    st.session_state.editando_registro = None
-                    st.rerun()
+                st.form_submit_button("❌ Cancelar", use_container_width=True, on_click=cancelar_edicao)
+
+    # Envia as mutações enfileiradas depois que a tela otimista já foi desenhada
+    if estado.sincronizar():
+        reexecutar_painel()
+
+@st.fragment
+def painel_operacional():
+    """Aba operacional; mutações re-renderizam só este fragmento"""
+    estado = dados.obter_estado_dia()
+
+    st.header("Gestão Operacional Diária")
+
+    col1, col2 = st.columns([1, 1])
+
+    # Coluna 1: Formulário de Registro
+    with col1:
+        st.subheader("➕ Novo Registro")
+
+        modo_entrada = st.radio(
+            "Modo de entrada",
+            ["Individual", "Em lote"],
+            horizontal=True,
+            label_visibility="collapsed"
+        )
+
+        if modo_entrada == "Individual":
+            with st.form("form_registro", clear_on_submit=True):
+                # Buscar lista de motoboys para autocomplete
+                lista_motoboys = dados.buscar_nomes_motoboys()
+
+                # Campo nome com autocomplete
+                if lista_motoboys:
+                    nome_selecionado = st.selectbox(
+                        "Nome do Motoboy",
+                        options=[""] + lista_motoboys + ["➕ Novo motoboy"],
+                        index=0
+                    )
+
+                    if nome_selecionado == "➕ Novo motoboy":
+                        nome = st.text_input("Digite o nome do novo motoboy")
+                    elif nome_selecionado == "":
+                        nome = st.text_input("Ou digite um nome")
+                    else:
+                        nome = nome_selecionado
+                else:
+                    nome = st.text_input("Nome do Motoboy")
+
+                data_registro = st.date_input(
+                    "Data",
+                    value=date.today(),
+                    format="DD/MM/YYYY"
+                )
+
+                col_periodo, col_tipo = st.columns(2)
+
+                with col_periodo:
+                    periodo = st.selectbox("Período", ["Manhã", "Noite"])
+
+                with col_tipo:
+                    tipo = st.selectbox("Tipo", ["Fixo", "Freelancer"])
+
+                entregas = st.number_input(
+                    "Número de Entregas",
+                    min_value=0,
+                    value=0,
+                    step=1
+                )
+
+                submitted = st.form_submit_button("✅ Registrar", use_container_width=True)
+
+                if submitted:
+                    if nome and nome.strip():
+                        # Aparece na lista ao lado já nesta execução; o banco é atualizado ao final
+                        estado.inserir(nome.strip(), data_registro, periodo, tipo, entregas)
+                        st.success(f"✅ Registro de {nome} adicionado com sucesso!")
+                    else:
+                        st.warning("⚠️ Por favor, preencha o nome do motoboy.")
+
+        else:
+            # Fechamento de turno: vários motoboys de uma vez, em uma única inserção
+            # Trocar a versão limpa o upload e a grade depois de um lote gravado
+            versao_lote = st.session_state.setdefault("versao_lote", 0)
+            arquivo_lote = st.file_uploader(
+                "Importar planilha (CSV ou Excel)",
+                type=["csv", "xlsx"],
+                help="Colunas: nome, data, periodo, tipo, entregas",
+                key=f"arquivo_lote_{versao_lote}"
+            )
+
+            df_lote = None
+            if arquivo_lote is not None:
+                try:
+                    if arquivo_lote.name.lower().endswith(".csv"):
+                        df_lote = pd.read_csv(arquivo_lote, sep=None, engine="python")
+                    else:
+                        df_lote = pd.read_excel(arquivo_lote)
+                    df_lote = dados.normalizar_planilha_lote(df_lote)
+                except (ValueError, pd.errors.ParserError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+                    st.error(f"❌ Não foi possível ler a planilha: {str(e)}")
+                    df_lote = None
+
+            if df_lote is None:
+                df_lote = pd.DataFrame({
+                    "nome": pd.Series(dtype="str"),
+                    "data": pd.Series(dtype="object"),
+                    "periodo": pd.Series(dtype="str"),
+                    "tipo": pd.Series(dtype="str"),
+                    "entregas": pd.Series(dtype="int")
+                })
+
+            with st.form("form_lote"):
+                df_editado = st.data_editor(
+                    df_lote,
+                    num_rows="dynamic",
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "nome": st.column_config.TextColumn("Nome do Motoboy", required=True),
+                        "data": st.column_config.DateColumn("Data", format="DD/MM/YYYY", default=date.today()),
+                        "periodo": st.column_config.SelectboxColumn("Período", options=dados.PERIODOS),
+                        "tipo": st.column_config.SelectboxColumn("Tipo", options=dados.TIPOS),
+                        "entregas": st.column_config.NumberColumn("Entregas", min_value=0, step=1, default=0)
+                    },
+                    key=f"editor_lote_{versao_lote}"
+                )
+
+                enviar_lote = st.form_submit_button("✅ Registrar Lote", use_container_width=True)
+
+            if enviar_lote:
+                registros_lote, erros_lote = dados.validar_registros_lote(df_editado)
+
+                if erros_lote:
+                    st.error("❌ Corrija na grade as linhas abaixo antes de registrar:\n\n" + "\n".join(f"- {e}" for e in erros_lote))
+                elif not registros_lote:
+                    st.warning("⚠️ Nenhum registro preenchido.")
                 else:
-                    st.error("❌ Erro ao atualizar registro.")
+                    try:
+                        gravados = dados.inserir_registros_lote(registros_lote)
+                    except Exception as e:
+                        st.error(f"❌ Erro ao adicionar registros: {str(e)}")
+                    else:
+                        st.session_state.versao_lote = versao_lote + 1
+                        st.session_state.mensagem_lote = f"✅ {gravados} registros adicionados com sucesso!"
+                        reexecutar_painel()
+
+            # A confirmação sobrevive à reexecução que limpa a grade
+            if "mensagem_lote" in st.session_state:
+                st.success(st.session_state.pop("mensagem_lote"))
+
+    # Coluna 2: Listagem do Dia
+    with col2:
+        # A lista vem depois do formulário: mostra a inserção otimista e a sincroniza
+        lista_registros_hoje()
 
-            if cancelar:
-                st.session_state.editando_registro = None
-                st.rerun()
+with tab_operacional:
+    painel_operacional()
 
 # ==================== ABA GERENCIAL ====================
 with tab_gerencial:
     st.header("Análise Gerencial e IA")
 
     # Buscar dados
-    config_atual = db.buscar_configuracao_ativa()
-    kpis_hoje = db.calcular_kpis_dia(date.today())
-    relatorio_semanal = db.gerar_relatorio_semanal()
+    config_atual = dados.buscar_configuracao_ativa()
 
     # SEÇÃO A: Configurações
     st.subheader("⚙️ Configurações Globais")
@@ -308,7 +858,7 @@ with tab_gerencial:
                 valor_diaria = utils.parse_moeda(valor_diaria_str)
                 valor_corrida = utils.parse_moeda(valor_corrida_str)
 
-                if db.salvar_configuracao(valor_diaria, valor_corrida):
+                if dados.salvar_configuracao(valor_diaria, valor_corrida):
                     st.success("✅ Configurações salvas com sucesso!")
                     st.rerun()
                 else:
@@ -326,199 +876,29 @@ with tab_gerencial:
     # SEÇÃO B: KPIs do Dia
     st.subheader("📈 Indicadores de Hoje")
 
-    col1, col2, col3, col4, col5 = st.columns(5)
-
-    with col1:
-        st.metric(
-            label="📦 Total Entregas",
-            value=kpis_hoje['total_entregas']
-        )
-
-    with col2:
-        st.metric(
-            label="🏍️ Total Motoboys",
-            value=kpis_hoje['total_motoboys']
-        )
-
-    with col3:
-        st.metric(
-            label="📊 Média Entregas/Moto",
-            value=f"{kpis_hoje['media_entregas_moto']:.1f}"
-        )
-
-    with col4:
-        st.metric(
-            label="💰 Custo Total",
-            value=utils.formatar_moeda(kpis_hoje['custo_total'])
-        )
-
-    with col5:
-        st.metric(
-            label="💵 Custo/Entrega",
-            value=utils.formatar_moeda(kpis_hoje['custo_medio_entrega'])
-        )
+    indicadores_hoje(config_atual)
 
     st.divider()
 
     # SEÇÃO C: Relatório Semanal
     st.subheader("📅 Relatório Semanal (Segunda até Hoje)")
 
-    if relatorio_semanal:
-        # Criar DataFrame
-        df_relatorio = pd.DataFrame(relatorio_semanal)
-
-        # Formatar coluna de valor devido
-        df_relatorio['Valor Devido'] = df_relatorio['valor_devido'].apply(utils.formatar_moeda)
-
-        # Renomear colunas para exibição
-        df_display = df_relatorio[[
-            'nome', 'tipo', 'dias_trabalhados', 'total_entregas', 'Valor Devido'
-        ]].rename(columns={
-            'nome': 'Motoboy',
-            'tipo': 'Tipo',
-            'dias_trabalhados': 'Dias Trabalhados',
-            'total_entregas': 'Total Entregas'
-        })
-
-        # Exibir tabela
-        st.dataframe(
-            df_display,
-            use_container_width=True,
-            hide_index=True
-        )
+    relatorio_semana()
 
-        # Gráficos
-        col_graf1, col_graf2 = st.columns(2)
-
-        with col_graf1:
-            # Gráfico de entregas por motoboy
-            fig_entregas = px.bar(
-                df_relatorio,
-                x='nome',
-                y='total_entregas',
-                color='tipo',
-                title='Entregas por Motoboy (Semana)',
-                labels={'nome': 'Motoboy', 'total_entregas': 'Entregas', 'tipo': 'Tipo'},
-                color_discrete_map={'Fixo': '#1f77b4', 'Freelancer': '#ff7f0e'}
-            )
-            st.plotly_chart(fig_entregas, use_container_width=True)
-
-        with col_graf2:
-            # Gráfico de valores devidos
-            df_fixos = df_relatorio[df_relatorio['tipo'] == 'Fixo']
-
-            if not df_fixos.empty:
-                fig_valores = px.bar(
-                    df_fixos,
-                    x='nome',
-                    y='valor_devido',
-                    title='Valores a Pagar - Motoboys Fixos (Semana)',
-                    labels={'nome': 'Motoboy', 'valor_devido': 'Valor (R$)'},
-                    color_discrete_sequence=['#2ca02c']
-                )
-                st.plotly_chart(fig_valores, use_container_width=True)
-            else:
-                st.info("Nenhum motoboy fixo com valores a pagar esta semana.")
-
-        # Totalizadores
-        total_geral_entregas = df_relatorio['total_entregas'].sum()
-        total_geral_valor = df_relatorio['valor_devido'].sum()
-
-        col_total1, col_total2, col_total3 = st.columns(3)
-
-        with col_total1:
-            st.metric("📦 Total Entregas (Semana)", total_geral_entregas)
+    st.divider()
 
-        with col_total2:
-            st.metric("💰 Total a Pagar (Semana)", utils.formatar_moeda(total_geral_valor))
+    # SEÇÃO D: Análise Histórica
+    st.subheader("📆 Análise Histórica")
+    st.caption("Custos calculados com os valores da configuração atual.")
 
-        with col_total3:
-            media_semanal = total_geral_entregas / len(df_relatorio) if len(df_relatorio) > 0 else 0
-            st.metric("📊 Média Entregas/Motoboy (Semana)", f"{media_semanal:.1f}")
-
-    else:
-        st.info("ℹ️ Nenhum registro encontrado para esta semana.")
+    analise_historica(config_atual)
 
     st.divider()
 
-    # SEÇÃO D: Assistente de IA
+    # SEÇÃO E: Assistente de IA
     st.subheader("🤖 Assistente de IA - Gemini 2.5 Flash")
 
-    col_chat, col_sugestoes = st.columns([2, 1])
-
-    with col_sugestoes:
-        st.write("**💡 Perguntas Sugeridas:**")
-
-        perguntas_sugeridas = ai_assistant.sugerir_perguntas()
-
-        for pergunta in perguntas_sugeridas:
-            if st.button(pergunta, key=f"sugestao_{pergunta[:20]}", use_container_width=True):
-                # Adicionar pergunta ao chat
-                st.session_state.chat_history.append({
-                    "role": "user",
-                    "message": pergunta
-                })
-
-                # Obter resposta da IA
-                resposta = ai_assistant.get_gemini_response(
-                    pergunta,
-                    kpis_hoje,
-                    relatorio_semanal,
-                    config_atual
-                )
-
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "message": resposta
-                })
-
-                st.rerun()
-
-    with col_chat:
-        st.write("**💬 Chat com Assistente:**")
-
-        # Container para o chat
-        chat_container = st.container()
-
-        with chat_container:
-            # Exibir histórico de mensagens
-            for msg in st.session_state.chat_history:
-                if msg["role"] == "user":
-                    st.chat_message("user").write(msg["message"])
-                else:
-                    st.chat_message("assistant").write(msg["message"])
-
-        # Input do usuário
-        user_input = st.chat_input("Digite sua pergunta sobre os dados...")
-
-        if user_input:
-            # Adicionar mensagem do usuário
-            st.session_state.chat_history.append({
-                "role": "user",
-                "message": user_input
-            })
-
-            # Obter resposta da IA
-            with st.spinner("🤔 Analisando dados..."):
-                resposta = ai_assistant.get_gemini_response(
-                    user_input,
-                    kpis_hoje,
-                    relatorio_semanal,
-                    config_atual
-                )
-
-            st.session_state.chat_history.append({
-                "role": "assistant",
-                "message": resposta
-            })
-
-            st.rerun()
-
-        # Botão para limpar chat
-        if st.session_state.chat_history:
-            if st.button("🗑️ Limpar Chat", use_container_width=True):
-                st.session_state.chat_history = []
-                st.rerun()
+    assistente_ia()
 
 # Rodapé
 st.divider()
@@ -1,12 +1,29 @@
 import streamlit as st
-import requests
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
-import json
-import time
+from typing import List, Dict, Callable
+import numpy as np
+from pipeline_despesas import (
+    CATEGORIA_NOMES,
+    LIMIAR_REVISAO,
+    ArmazemDespesas,
+    GerenciadorTarefas,
+    IndiceBusca,
+    MemoriaCategorizacoes,
+    MotorDespesas,
+    OrcamentoTokens,
+    adicionar_colunas_derivadas,
+    buscar_grupos as buscar_grupos_splitwise,
+    calcular_cubo_agregado,
+    calcular_indice_busca,
+    calcular_ordem_data,
+    carregar_historico_telemetria,
+    carregar_snapshot,
+    confirmar_categorias,
+    gerar_csv
+)
 
 # Configuração da página
 st.set_page_config(
@@ -16,226 +33,216 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Categorias com emojis
-CATEGORIAS = {
-    "🏠 Moradia": ["aluguel", "condomínio", "iptu", "seguro residencial"],
-    "💡 Contas": ["luz", "água", "gás", "internet", "telefone", "energia elétrica"],
-    "🛒 Mercado": ["supermercado", "feira", "açougue", "padaria", "hortifruti"],
-    "🍽️ Alimentação": ["restaurante", "lanche", "delivery", "ifood", "uber eats", "jantar", "almoço"],
-    "🚗 Transporte": ["uber", "combustível", "gasolina", "estacionamento", "ônibus", "metrô"],
-    "🏥 Saúde": ["farmácia", "médico", "dentista", "exame", "remédio", "consulta"],
-    "🎉 Lazer": ["cinema", "show", "teatro", "viagem", "passeio", "festa", "bar"],
-    "🏡 Casa": ["móveis", "decoração", "reforma", "manutenção", "limpeza"],
-    "👤 Pessoal": ["roupa", "cabelo", "estética", "academia", "beleza"],
-    "💻 Tecnologia": ["eletrônico", "streaming", "netflix", "spotify", "software"],
-    "🐾 Pet": ["veterinário", "ração", "pet shop", "banho e tosa"],
-    "📦 Outros": []
-}
-
-CATEGORIA_NOMES = list(CATEGORIAS.keys())
-
-# Função de categorização por palavras-chave (fallback)
-def categorizar_por_palavras_chave(descricao: str) -> Tuple[str, float]:
-    """Categoriza descrição usando palavras-chave como fallback"""
-    descricao_lower = descricao.lower()
-
-    for categoria, palavras in CATEGORIAS.items():
-        for palavra in palavras:
-            if palavra in descricao_lower:
-                return categoria, 0.6  # Confiança média para fallback
-
-    return "📦 Outros", 0.3  # Baixa confiança para categoria genérica
-
 # Cache para requisições da API
 @st.cache_data(ttl=1800)
 def buscar_grupos(api_key: str) -> List[Dict]:
     """Busca grupos do Splitwise"""
     try:
-        headers = {"Authorization": f"Bearer {api_key}"}
-        response = requests.get(
-            "https://secure.splitwise.com/api/v3.0/get_groups",
-            headers=headers,
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
-        return data.get("groups", [])
+        return buscar_grupos_splitwise(api_key)
     except Exception as e:
         st.error(f"Erro ao buscar grupos: {str(e)}")
         return []
 
-@st.cache_data(ttl=1800)
-def buscar_despesas(api_key: str, group_id: int, meses: int) -> List[Dict]:
-    """Busca despesas do Splitwise"""
-    try:
-        data_inicio = datetime.now() - timedelta(days=meses * 30)
-        headers = {"Authorization": f"Bearer {api_key}"}
-
-        params = {
-            "group_id": group_id,
-            "dated_after": data_inicio.strftime("%Y-%m-%d"),
-            "limit": 1000
-        }
-
-        response = requests.get(
-            "https://secure.splitwise.com/api/v3.0/get_expenses",
-            headers=headers,
-            params=params,
-            timeout=15
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        # Filtrar pagamentos
-        despesas = [e for e in data.get("expenses", []) if not e.get("payment", False)]
-        return despesas
-    except Exception as e:
-        st.error(f"Erro ao buscar despesas: {str(e)}")
-        return []
+@st.cache_resource
+def obter_armazem(group_id: int) -> ArmazemDespesas:
+    """Um armazém por grupo, compartilhado entre as sessões"""
+    return ArmazemDespesas(group_id)
+
+@st.cache_resource
+def obter_orcamento_tokens() -> OrcamentoTokens:
+    """Estimador de tokens compartilhado, que aprende entre execuções"""
+    return OrcamentoTokens()
+
+@st.cache_resource
+def obter_memoria_categorizacoes() -> MemoriaCategorizacoes:
+    """Memória de categorizações compartilhada entre sessões e tarefas"""
+    return MemoriaCategorizacoes()
+
+@st.cache_resource
+def obter_gerenciador_tarefas() -> GerenciadorTarefas:
+    """Gerenciador único por processo, sobrevive ao fechamento da aba"""
+    return GerenciadorTarefas()
+
+def criar_motor(splitwise_api_key: str, groq_api_key: str) -> MotorDespesas:
+    """Motor do pipeline com os caches do Streamlit plugados
+
+    O motor também roda nas threads das tarefas, sem contexto do Streamlit:
+    os avisos ficam no logging por padrão e chegam à tela pela chamada
+    (`ao_aviso=st.warning`) ou pelos avisos da tarefa.
+    """
+    return MotorDespesas(
+        splitwise_api_key,
+        groq_api_key,
+        obter_armazem=obter_armazem,
+        memoria=obter_memoria_categorizacoes(),
+        orcamento=obter_orcamento_tokens()
+    )
 
-def categorizar_com_groq(descricoes: List[str], api_key: str) -> List[Dict]:
-    """Categoriza descrições usando Groq API"""
-    try:
-        prompt = f"""Você é um assistente especializado em categorizar despesas financeiras.
-
-Categorias disponíveis:
-{', '.join([c.split(' ', 1)[1] for c in CATEGORIA_NOMES])}
-
-Analise as seguintes descrições de despesas e retorne um JSON array com objetos contendo:
-- "descricao": a descrição original
-- "categoria": a categoria (apenas o nome, sem emoji)
-- "confianca": número entre 0 e 1 indicando confiança
-
-Descrições:
-{json.dumps(descricoes, ensure_ascii=False)}
-
-IMPORTANTE: Retorne APENAS o JSON array, sem markdown, sem explicações, sem blocos de código."""
-
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": "llama-3.3-70b-versatile",
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.3,
-            "max_tokens": 4096
-        }
-
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30
+def obter_derivado_df(chave: str, construir: Callable[[pd.DataFrame], object]):
+    """Retorna uma estrutura derivada do df atual, recalculando apenas quando o df muda"""
+    versao = st.session_state.get("df_versao")
+    if st.session_state.get(f"{chave}_versao") != versao or chave not in st.session_state:
+        st.session_state[chave] = construir(st.session_state["df"])
+        st.session_state[f"{chave}_versao"] = versao
+    return st.session_state[chave]
+
+def obter_ordem_data() -> np.ndarray:
+    """Retorna a ordenação por data do df atual, recalculando apenas quando o df muda"""
+    return obter_derivado_df("ordem_data", calcular_ordem_data)
+
+def obter_cubo_agregado() -> pd.DataFrame:
+    """Retorna o cubo do df atual, recalculando apenas quando o df muda"""
+    return obter_derivado_df("cubo", calcular_cubo_agregado)
+
+def obter_indice_busca() -> IndiceBusca:
+    """Retorna o índice de busca do df atual, recalculando apenas quando o df muda"""
+    return obter_derivado_df("indice_busca", calcular_indice_busca)
+
+# Exportação e paginação da tabela
+OPCOES_TAMANHO_PAGINA = [25, 50, 100, 250]
+INTERVALO_ACOMPANHAMENTO = 2  # Segundos entre atualizações do painel
+IDADE_MAXIMA_SNAPSHOT = timedelta(hours=36)  # Snapshots noturnos mais antigos são ignorados
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def exportar_csv(df: pd.DataFrame) -> bytes:
+    """Serializa o df em CSV; o cache é indexado pelo conteúdo do df"""
+    return gerar_csv(df)
+
+def publicar_df(df: pd.DataFrame, cubo: pd.DataFrame = None):
+    """Armazena o df no session state e reconstrói as estruturas derivadas"""
+    st.session_state["df"] = df
+    st.session_state["df_versao"] = st.session_state.get("df_versao", 0) + 1
+
+    # Cubo vindo de um snapshot pré-computado dispensa o recálculo
+    if cubo is not None:
+        st.session_state["cubo"] = cubo
+        st.session_state["cubo_versao"] = st.session_state["df_versao"]
+
+    # Estruturas derivadas são construídas uma vez por df
+    obter_cubo_agregado()
+    obter_indice_busca()
+    st.session_state["ultima_atualizacao"] = datetime.now().strftime("%d/%m/%Y às %H:%M:%S")
+
+@st.fragment(run_every=INTERVALO_ACOMPANHAMENTO)
+def acompanhar_tarefa():
+    """Exibe o progresso da tarefa e publica as linhas já categorizadas"""
+    tarefa = obter_gerenciador_tarefas().obter(st.session_state["tarefa_id"])
+
+    if tarefa is None:
+        # Tarefa de outro processo (ex.: servidor reiniciado): não há o que acompanhar
+        st.session_state.pop("tarefa_id", None)
+        st.query_params.pop("tarefa", None)
+        return
+
+    if tarefa.em_andamento:
+        progresso = tarefa.processadas / tarefa.total if tarefa.total else 0.0
+        st.progress(progresso, text=tarefa.mensagem or "Aguardando na fila...")
+    elif tarefa.status == "erro":
+        st.error(f"Erro na categorização: {tarefa.erro}")
+
+    avisos = tarefa.listar_avisos()
+    for aviso in avisos:
+        st.warning(aviso)
+
+    # Novos resultados: publica o df parcial e reexecuta o app para atualizar os gráficos
+    total_resultados = len(tarefa.resultados)
+    atualizar = total_resultados != st.session_state.get("tarefa_resultados")
+
+    if atualizar:
+        st.session_state["tarefa_resultados"] = total_resultados
+        df = tarefa.montar_frame()
+        if not df.empty:
+            publicar_df(df)
+
+    if not tarefa.em_andamento:
+        st.session_state["telemetria"] = tarefa.telemetria.resumo()
+        st.session_state["avisos_tarefa"] = avisos
+        st.session_state.pop("tarefa_id", None)
+        st.query_params.pop("tarefa", None)
+        atualizar = True
+
+    if atualizar:
+        st.rerun(scope="app")
+
+def renderizar_telemetria():
+    """Painel com custo e latência da última categorização e a tendência histórica"""
+    resumo = st.session_state.get("telemetria")
+    historico = carregar_historico_telemetria()
+
+    if resumo is None and historico.empty:
+        return
+
+    with st.expander("📡 Telemetria da Categorização", expanded=False):
+        if resumo:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Chamadas ao Groq", resumo["chamadas"], help=f"{resumo['retentativas']} retentativas, {resumo['erros']} erros")
+            col2.metric("Latência média/p95", f"{resumo['latencia_media_s']:.1f}s / {resumo['latencia_p95_s']:.1f}s")
+            col3.metric("Tokens (prompt + resposta)", f"{resumo['tokens_prompt']:,} + {resumo['tokens_resposta']:,}")
+            col4.metric("Duração total", f"{resumo['duracao_s']:.1f}s")
+
+            col5, col6, col7 = st.columns(3)
+            col5.metric("Itens categorizados", f"{resumo['itens']:,}")
+            col6.metric("Taxa de cache local", f"{resumo['taxa_cache_local'] * 100:.1f}%")
+            col7.metric("Taxa de fallback", f"{resumo['taxa_fallback'] * 100:.1f}%")
+
+        if len(historico) > 1:
+            fig_tendencia = px.line(
+                historico,
+                x="timestamp",
+                y=["tokens_prompt", "tokens_resposta"],
+                title="Tokens por Execução",
+                labels={"value": "Tokens", "timestamp": "Execução", "variable": "Tipo"},
+                height=300,
+                markers=True
+            )
+            st.plotly_chart(fig_tendencia, use_container_width=True)
+
+def renderizar_revisao(df: pd.DataFrame):
+    """Fila de revisão: o usuário confirma categorias dos itens de baixa confiança"""
+    baixa = df[df["confianca"] < LIMIAR_REVISAO].drop_duplicates("descricao")
+    if baixa.empty:
+        return
+
+    with st.expander(f"🔁 Revisar Itens de Baixa Confiança ({len(baixa):,})", expanded=False):
+        st.caption(
+            "Altere a categoria ou marque a sugestão como correta. Só as linhas alteradas ou marcadas "
+            "passam a valer com 100% de confiança e deixam de ser enviadas à IA."
         )
-        response.raise_for_status()
-
-        resultado = response.json()
-        texto_resposta = resultado["choices"][0]["message"]["content"].strip()
 
-        # Remover markdown se presente
-        if texto_resposta.startswith("```"):
-            linhas = texto_resposta.split("\n")
-            texto_resposta = "\n".join(linhas[1:-1])
-
-        categorizacoes = json.loads(texto_resposta)
-
-        # Adicionar emojis às categorias
-        for cat in categorizacoes:
-            nome_sem_emoji = cat["categoria"]
-            for cat_completa in CATEGORIA_NOMES:
-                if nome_sem_emoji in cat_completa:
-                    cat["categoria"] = cat_completa
-                    break
-
-        return categorizacoes
-    except Exception as e:
-        st.warning(f"Erro na categorização com IA: {str(e)}. Usando fallback.")
-        return []
-
-def processar_despesas(despesas: List[Dict], groq_api_key: str) -> pd.DataFrame:
-    """Processa despesas e categoriza com IA"""
-    if not despesas:
-        return pd.DataFrame()
-
-    dados = []
-    descricoes_para_categorizar = []
-    indices_map = {}
-
-    # Preparar dados
-    for i, despesa in enumerate(despesas):
-        descricao = despesa.get("description", "Sem descrição")
-        custo = float(despesa.get("cost", 0))
-        data = despesa.get("date", "")
-
-        dados.append({
-            "descricao": descricao,
-            "valor": custo,
-            "data": pd.to_datetime(data) if data else None,
-            "categoria": None,
-            "confianca": None
-        })
-
-        descricoes_para_categorizar.append(descricao)
-        indices_map[descricao] = i
-
-    # Categorizar em lotes
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    batch_size = 50
-    total_batches = (len(descricoes_para_categorizar) + batch_size - 1) // batch_size
-
-    for batch_idx in range(0, len(descricoes_para_categorizar), batch_size):
-        batch = descricoes_para_categorizar[batch_idx:batch_idx + batch_size]
-        batch_num = batch_idx // batch_size + 1
-
-        status_text.text(f"Categorizando lote {batch_num}/{total_batches}...")
-
-        # Tentar categorizar com Groq
-        categorizacoes = categorizar_com_groq(batch, groq_api_key)
-
-        if categorizacoes:
-            for cat in categorizacoes:
-                idx = indices_map.get(cat["descricao"])
-                if idx is not None:
-                    dados[idx]["categoria"] = cat["categoria"]
-                    dados[idx]["confianca"] = cat["confianca"]
-        else:
-            # Fallback para palavras-chave
-            for desc in batch:
-                idx = indices_map[desc]
-                categoria, confianca = categorizar_por_palavras_chave(desc)
-                dados[idx]["categoria"] = categoria
-                dados[idx]["confianca"] = confianca
-
-        progress = (batch_idx + len(batch)) / len(descricoes_para_categorizar)
-        progress_bar.progress(progress)
-
-        # Rate limiting
-        time.sleep(0.5)
-
-    progress_bar.empty()
-    status_text.empty()
+        df_revisao = baixa[["descricao", "categoria", "confianca_formatada"]].reset_index(drop=True)
+        df_revisao.insert(0, "confirmar", False)
+        editado = st.data_editor(
+            df_revisao,
+            column_config={
+                "confirmar": st.column_config.CheckboxColumn("Confirmar", help="A categoria sugerida está correta"),
+                "descricao": st.column_config.TextColumn("Descrição", disabled=True),
+                "categoria": st.column_config.SelectboxColumn("Categoria", options=CATEGORIA_NOMES, required=True),
+                "confianca_formatada": st.column_config.TextColumn("Confiança", disabled=True)
+            },
+            use_container_width=True,
+            hide_index=True,
+            key="editor_revisao"
+        )
 
-    df = pd.DataFrame(dados)
+        if st.button("✅ Confirmar Categorias", use_container_width=True):
+            # Sugestões não tocadas continuam como estão, sem virar verdade absoluta
+            revisadas = editado[editado["confirmar"] | (editado["categoria"] != df_revisao["categoria"])]
+            confirmacoes = dict(zip(revisadas["descricao"], revisadas["categoria"]))
+            if not confirmacoes:
+                st.info("Nenhuma categoria alterada ou marcada para confirmar.")
+                return
 
-    # Adicionar colunas auxiliares
-    df["mes"] = df["data"].dt.to_period("M").astype(str)
-    df["status_confianca"] = df["confianca"].apply(
-        lambda x: "Alta (≥80%)" if x >= 0.8 else "Média (50-79%)" if x >= 0.5 else "Baixa (<50%)"
-    )
-    df["confianca_percentual"] = (df["confianca"] * 100).round(1)
+            confirmar_categorias(confirmacoes, obter_memoria_categorizacoes())
 
-    # Colunas formatadas para exibição
-    df["data_formatada"] = df["data"].dt.strftime("%d/%m/%Y")
-    df["valor_formatado"] = df["valor"].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-    df["confianca_formatada"] = df["confianca_percentual"].apply(lambda x: f"{x}%")
+            # Atualiza o df exibido sem reprocessar
+            df = df.copy()
+            confirmadas = df["descricao"].isin(confirmacoes.keys())
+            df.loc[confirmadas, "categoria"] = df.loc[confirmadas, "descricao"].map(confirmacoes)
+            df.loc[confirmadas, "confianca"] = 1.0
+            publicar_df(adicionar_colunas_derivadas(df))
 
-    return df
+            st.success(f"✅ {len(confirmacoes)} categorias confirmadas!")
+            st.rerun()
 
 # Interface principal
 def main():
@@ -268,6 +275,8 @@ def main():
             st.warning("⚠️ Configure as API Keys para continuar")
             st.stop()
 
+        motor = criar_motor(splitwise_api_key, groq_api_key)
+
         st.divider()
 
         # Seleção de grupo
@@ -279,11 +288,21 @@ def main():
             st.stop()
 
         opcoes_grupos = {g["name"]: g["id"] for g in grupos}
-        grupo_selecionado = st.selectbox(
-            "Selecione o grupo",
-            options=list(opcoes_grupos.keys())
-        )
-        grupo_id = opcoes_grupos[grupo_selecionado]
+        multigrupo = st.toggle("Comparar vários grupos", value=False)
+
+        if multigrupo:
+            grupos_selecionados = st.multiselect(
+                "Selecione os grupos",
+                options=list(opcoes_grupos.keys()),
+                default=list(opcoes_grupos.keys())[:2]
+            )
+        else:
+            grupos_selecionados = [st.selectbox(
+                "Selecione o grupo",
+                options=list(opcoes_grupos.keys())
+            )]
+
+        grupos_ids = {opcoes_grupos[nome]: nome for nome in grupos_selecionados}
 
         # Período
         st.subheader("📅 Período")
@@ -306,8 +325,12 @@ def main():
 
     # Área principal
     if processar:
+        if not grupos_ids:
+            st.warning("Selecione ao menos um grupo")
+            st.stop()
+
         with st.spinner("Buscando despesas..."):
-            despesas = buscar_despesas(splitwise_api_key, grupo_id, meses)
+            despesas = motor.buscar(grupos_ids, meses, ao_aviso=st.warning)
 
         if not despesas:
             st.warning("Nenhuma despesa encontrada no período selecionado")
@@ -315,38 +338,62 @@ def main():
 
         st.success(f"✅ {len(despesas)} despesas encontradas")
 
-        with st.spinner("Categorizando com IA..."):
-            df = processar_despesas(despesas, groq_api_key)
-
-        if df.empty:
-            st.error("Erro ao processar despesas")
-            st.stop()
-
-        # Armazenar no session state
-        st.session_state["df"] = df
-        st.session_state["ultima_atualizacao"] = datetime.now().strftime("%d/%m/%Y às %H:%M:%S")
+        # Categorização roda em segundo plano; o painel acompanha o progresso
+        tarefa = obter_gerenciador_tarefas().submeter(despesas, motor)
+        st.session_state["tarefa_id"] = tarefa.id
+        st.session_state.pop("tarefa_resultados", None)
+        st.session_state.pop("avisos_tarefa", None)
+        st.query_params["tarefa"] = tarefa.id
+
+    # Reabrir a aba retoma o acompanhamento da tarefa em andamento
+    if "tarefa_id" not in st.session_state and "tarefa" in st.query_params:
+        st.session_state["tarefa_id"] = st.query_params["tarefa"]
+
+    if "tarefa_id" in st.session_state:
+        acompanhar_tarefa()
+    else:
+        # Avisos da última categorização continuam visíveis depois que ela termina
+        for aviso in st.session_state.get("avisos_tarefa", []):
+            st.warning(aviso)
+
+    # Sem dados na sessão, abre direto do snapshot noturno da seleção, se houver
+    selecao_snapshot = (tuple(sorted(grupos_ids)), meses)
+    if (
+        "df" not in st.session_state
+        and "tarefa_id" not in st.session_state
+        and st.session_state.get("snapshot_verificado") != selecao_snapshot
+    ):
+        st.session_state["snapshot_verificado"] = selecao_snapshot
+        snapshot = carregar_snapshot(list(grupos_ids), meses, IDADE_MAXIMA_SNAPSHOT)
+        if snapshot is not None:
+            df_snapshot, cubo_snapshot, manifesto = snapshot
+            publicar_df(df_snapshot, cubo_snapshot)
+            gerado_em = datetime.fromisoformat(manifesto["gerado_em"])
+            st.session_state["ultima_atualizacao"] = f"{gerado_em:%d/%m/%Y às %H:%M:%S} (pré-computado)"
 
     # Exibir análises se houver dados
     if "df" in st.session_state:
         df = st.session_state["df"]
+        cubo = obter_cubo_agregado()
+        total_gastos = int(cubo["quantidade"].sum())
 
         # Métricas principais
         st.header("📊 Resumo")
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
-            st.metric("Total de Gastos", f"{len(df):,}")
+            st.metric("Total de Gastos", f"{total_gastos:,}")
 
         with col2:
-            st.metric("Valor Total", f"R$ {df['valor'].sum():,.2f}")
+            st.metric("Valor Total", f"R$ {cubo['valor'].sum():,.2f}")
 
         with col3:
-            alta_confianca = (df["confianca"] >= 0.8).sum()
-            pct_alta = (alta_confianca / len(df) * 100)
+            alta_confianca = cubo["alta"].sum()
+            pct_alta = (alta_confianca / total_gastos * 100)
             st.metric("Alta Confiança", f"{pct_alta:.1f}%")
 
         with col4:
-            revisar = (df["confianca"] < 0.5).sum()
+            revisar = int(cubo["revisar"].sum())
             st.metric("Itens para Revisar", f"{revisar:,}")
 
         st.divider()
@@ -372,37 +419,69 @@ def main():
         with col3:
             busca_texto = st.text_input("🔎 Buscar na descrição", "")
 
+        grupos_df = sorted(df["grupo"].unique())
+        filtro_grupo = grupos_df
+        if len(grupos_df) > 1:
+            filtro_grupo = st.multiselect("Grupos", options=grupos_df, default=grupos_df)
+
         # Aplicar filtros
-        df_filtrado = df[
+        mascara = (
             (df["status_confianca"].isin(filtro_status)) &
-            (df["categoria"].isin(filtro_categoria))
-        ]
+            (df["categoria"].isin(filtro_categoria)) &
+            (df["grupo"].isin(filtro_grupo))
+        ).to_numpy()
 
         if busca_texto:
-            df_filtrado = df_filtrado[
-                df_filtrado["descricao"].str.contains(busca_texto, case=False, na=False)
-            ]
+            mascara &= obter_indice_busca().buscar(busca_texto)
+
+        # Tabela paginada: só a página visível é enviada ao navegador
+        posicoes = obter_ordem_data()
+        posicoes = posicoes[mascara[posicoes]]
+        total_filtrado = len(posicoes)
+
+        col_tamanho, col_pagina, col_info = st.columns([1, 1, 2])
 
-        # Tabela interativa
-        df_filtrado_ordenado = df_filtrado.sort_values("data", ascending=False).reset_index(drop=True)
-        df_exibicao = df_filtrado_ordenado[["data_formatada", "descricao", "categoria", "valor_formatado", "confianca_formatada", "status_confianca"]].copy()
-        df_exibicao.columns = ["Data", "Descrição", "Categoria", "Valor", "Confiança", "Status"]
+        with col_tamanho:
+            tamanho_pagina = st.selectbox("Linhas por página", OPCOES_TAMANHO_PAGINA, index=1)
+
+        total_paginas = max((total_filtrado + tamanho_pagina - 1) // tamanho_pagina, 1)
+
+        with col_pagina:
+            pagina = st.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+
+        inicio = (pagina - 1) * tamanho_pagina
+        fim = min(inicio + tamanho_pagina, total_filtrado)
+
+        with col_info:
+            st.write("")
+            st.caption(f"Exibindo {inicio + 1 if total_filtrado else 0}–{fim} de {total_filtrado:,} despesas")
+
+        df_pagina = df.iloc[posicoes[inicio:fim]]
+        df_exibicao = df_pagina[["data_formatada", "grupo", "descricao", "categoria", "valor_formatado", "confianca_formatada", "status_confianca"]].copy()
+        df_exibicao.columns = ["Data", "Grupo", "Descrição", "Categoria", "Valor", "Confiança", "Status"]
+
+        if len(grupos_df) <= 1:
+            df_exibicao = df_exibicao.drop(columns="Grupo")
 
         st.dataframe(
             df_exibicao,
             use_container_width=True,
-            height=400
+            height=400,
+            hide_index=True
         )
 
-        # Botão de download
-        csv = df.to_csv(index=False, encoding="utf-8-sig")
+        # Botão de download: o CSV só é gerado quando o usuário clica
         st.download_button(
             label="📥 Download CSV",
-            data=csv,
+            data=lambda: exportar_csv(df),
             file_name=f"despesas_categorizadas_{datetime.now().strftime('%Y%m%d')}.csv",
-            mime="text/csv"
+            mime="text/csv",
+            on_click="ignore"
         )
 
+        renderizar_revisao(df)
+        renderizar_telemetria()
+
         st.divider()
 
         # Visualizações
@@ -410,7 +489,8 @@ def main():
 
         # Gráfico de colunas empilhadas por mês
         st.subheader("Gastos por Mês e Categoria")
-        df_mes_cat = df.groupby(["mes", "categoria"])["valor"].sum().reset_index()
+        cubo_datado = cubo[cubo["mes"].notna()]
+        df_mes_cat = cubo_datado.groupby(["mes", "categoria"])["valor"].sum().reset_index()
 
         fig_mes = px.bar(
             df_mes_cat,
@@ -424,12 +504,44 @@ def main():
         fig_mes.update_layout(xaxis_tickangle=-45)
         st.plotly_chart(fig_mes, use_container_width=True)
 
+        # Comparação entre grupos (modo multigrupo)
+        if cubo["grupo"].nunique() > 1:
+            st.subheader("Gastos por Grupo")
+            df_grupo_mes = cubo_datado.groupby(["mes", "grupo"])["valor"].sum().reset_index()
+
+            fig_grupos = px.bar(
+                df_grupo_mes,
+                x="mes",
+                y="valor",
+                color="grupo",
+                barmode="group",
+                title="Comparação Mensal entre Grupos",
+                labels={"valor": "Valor (R$)", "mes": "Mês", "grupo": "Grupo"},
+                height=450
+            )
+            fig_grupos.update_layout(xaxis_tickangle=-45)
+            st.plotly_chart(fig_grupos, use_container_width=True)
+
+            df_grupo_cat = cubo.groupby(["grupo", "categoria"])["valor"].sum().reset_index()
+            fig_grupo_cat = px.bar(
+                df_grupo_cat,
+                x="valor",
+                y="grupo",
+                color="categoria",
+                orientation="h",
+                title="Categorias por Grupo",
+                labels={"valor": "Valor (R$)", "grupo": "Grupo"},
+                height=350
+            )
+            st.plotly_chart(fig_grupo_cat, use_container_width=True)
+
         # Gráfico de pizza
+        totais_categoria = cubo.groupby("categoria")["valor"].sum()
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("Distribuição por Categoria")
-            df_categoria = df.groupby("categoria")["valor"].sum().reset_index()
+            df_categoria = totais_categoria.reset_index()
 
             fig_pizza = px.pie(
                 df_categoria,
@@ -442,7 +554,7 @@ def main():
 
         with col2:
             st.subheader("Evolução Temporal")
-            df_evolucao = df.groupby("mes")["valor"].sum().reset_index()
+            df_evolucao = cubo_datado.groupby("mes")["valor"].sum().reset_index()
 
             fig_linha = px.line(
                 df_evolucao,
@@ -457,7 +569,7 @@ def main():
 
         # Top categorias
         st.subheader("Top 5 Categorias por Valor")
-        top5 = df.groupby("categoria")["valor"].sum().sort_values(ascending=False).head(5)
+        top5 = totais_categoria.sort_values(ascending=False).head(5)
 
         fig_top5 = go.Figure(go.Bar(
             x=top5.values,
@@ -0,0 +1,238 @@
+"""
+Camada do assistente de IA do Sistema de Controle de Motoboys
+
+Antes de chamar o Gemini, resume o contexto (KPIs, relatório semanal e
+configuração) num formato compacto de tamanho limitado e consulta um cache
+de respostas indexado pela pergunta normalizada e por um hash dos dados.
+Perguntas repetidas sobre dados inalterados voltam na hora, e o prompt não
+cresce com o número de motoboys.
+
+As respostas novas chegam em fluxo (streaming) direto do SDK do Gemini e são
+exibidas conforme os tokens são gerados. Com ferramentas de consulta, o
+modelo busca sozinho os números de outros períodos (function calling) em vez
+de tudo ir no prompt.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from google import genai
+from google.genai import types
+
+MODELO_GEMINI = "gemini-2.5-flash"
+MAX_MOTOBOYS_CONTEXTO = 10  # Motoboys detalhados no contexto; o resto vira uma linha agregada
+MAX_RESPOSTAS_CACHE = 200
+TTL_RESPOSTAS = 3600  # Segundos
+MAX_RODADAS_FERRAMENTAS = 4  # Rodadas de chamadas de ferramenta antes de exigir a resposta final
+
+
+# Prompt próprio das respostas em fluxo: ai_assistant.get_gemini_response só devolve o texto completo
+INSTRUCOES_SISTEMA = """Você é o assistente gerencial de uma operação de entregas com motoboys.
+Responda em português do Brasil, de forma objetiva, usando apenas os dados fornecidos.
+Formate valores como R$ 1.234,56. Se a informação não estiver nos dados, diga isso."""
+
+INSTRUCOES_FERRAMENTAS = """
+Para outros períodos, outros dias ou detalhes por motoboy, consulte as ferramentas em vez de estimar.
+Use datas no formato AAAA-MM-DD. Hoje é {hoje}."""
+
+
+def _arredondar(valor):
+    return round(float(valor), 2) if isinstance(valor, float) else valor
+
+
+def montar_contexto_compacto(
+    kpis: Dict,
+    relatorio: List[Dict],
+    config: Dict,
+    max_motoboys: int = MAX_MOTOBOYS_CONTEXTO
+) -> Tuple[Dict, List[Dict], Dict]:
+    """
+    Reduz o contexto enviado ao modelo a um tamanho fixo.
+
+    Mantém os motoboys com mais entregas e soma os demais numa linha
+    "Outros", preservando os totais da semana.
+
+    Returns:
+        (kpis, relatorio, config) no mesmo formato esperado pelo assistente
+    """
+    kpis_compactos = {chave: _arredondar(valor) for chave, valor in kpis.items()}
+    config_compacta = {
+        "valor_diaria": _arredondar(float(config.get("valor_diaria", 0))),
+        "valor_corrida": _arredondar(float(config.get("valor_corrida", 0)))
+    }
+
+    ordenado = sorted(relatorio, key=lambda linha: (-linha["total_entregas"], linha["nome"]))
+    relatorio_compacto = [
+        {
+            "nome": linha["nome"],
+            "tipo": linha["tipo"],
+            "dias_trabalhados": linha["dias_trabalhados"],
+            "total_entregas": linha["total_entregas"],
+            "valor_devido": _arredondar(float(linha["valor_devido"]))
+        }
+        for linha in ordenado[:max_motoboys]
+    ]
+
+    restantes = ordenado[max_motoboys:]
+    if restantes:
+        relatorio_compacto.append({
+            "nome": f"Outros ({len(restantes)} motoboys)",
+            "tipo": "Vários",
+            "dias_trabalhados": max(linha["dias_trabalhados"] for linha in restantes),
+            "total_entregas": sum(linha["total_entregas"] for linha in restantes),
+            "valor_devido": _arredondar(float(sum(linha["valor_devido"] for linha in restantes)))
+        })
+
+    return kpis_compactos, relatorio_compacto, config_compacta
+
+
+def versao_dados(*partes) -> str:
+    """Hash estável do contexto; muda sempre que algum número muda"""
+    conteudo = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:16]
+
+
+def normalizar_pergunta(pergunta: str) -> str:
+    """Ignora caixa, espaços extras e pontuação final ao comparar perguntas"""
+    return re.sub(r"\s+", " ", pergunta.strip().lower()).rstrip("?!. ")
+
+
+class CacheRespostas:
+    """Cache LRU de respostas com expiração, seguro para várias sessões"""
+
+    def __init__(self, max_entradas: int = MAX_RESPOSTAS_CACHE, ttl: float = TTL_RESPOSTAS):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.entradas: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            entrada = self.entradas.get(chave)
+            if entrada is None or time.monotonic() - entrada[0] > self.ttl:
+                self.entradas.pop(chave, None)
+                self.falhas += 1
+                return None
+
+            self.entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+
+    def guardar(self, chave: Tuple[str, str], resposta: str):
+        with self._lock:
+            self.entradas[chave] = (time.monotonic(), resposta)
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.max_entradas:
+                self.entradas.popitem(last=False)
+
+
+def montar_prompt(pergunta: str, kpis: Dict, relatorio: List[Dict], config: Dict) -> str:
+    """Prompt com o contexto compacto serializado"""
+    return f"""Dados atuais:
+KPIs de hoje: {json.dumps(kpis, ensure_ascii=False)}
+Relatório semanal (segunda até hoje): {json.dumps(relatorio, ensure_ascii=False)}
+Configuração: {json.dumps(config, ensure_ascii=False)}
+
+Pergunta: {pergunta}"""
+
+
+def _executar_ferramenta(ferramentas: Dict[str, Callable[..., Dict]], nome: str, argumentos: Dict) -> Dict:
+    """Executa a ferramenta pedida; erros voltam ao modelo para ele corrigir a chamada ou avisar o usuário"""
+    funcao = ferramentas.get(nome)
+    if funcao is None:
+        return {"erro": f"Ferramenta desconhecida: {nome}"}
+    try:
+        return funcao(**(argumentos or {}))
+    except (TypeError, ValueError) as e:
+        return {"erro": str(e)}
+    except Exception as e:
+        return {"erro": f"Falha ao consultar os dados: {str(e)}"}
+
+
+def responder_em_fluxo(
+    pergunta: str,
+    kpis: Dict,
+    relatorio: List[Dict],
+    config: Dict,
+    cliente: genai.Client,
+    cache: Optional[CacheRespostas] = None,
+    ferramentas: Optional[Dict[str, Callable[..., Dict]]] = None,
+    versao: str = ""
+) -> Iterator[str]:
+    """
+    Gera a resposta em pedaços conforme o modelo produz os tokens.
+
+    Respostas em cache saem de uma vez; as novas são guardadas ao final do
+    fluxo, se completas. Com `ferramentas`, as chamadas de função do modelo
+    são executadas e devolvidas a ele até a resposta final; `versao` deve
+    mudar sempre que os dados que elas consultam mudarem.
+    """
+    contexto = montar_contexto_compacto(kpis, relatorio, config)
+    chave = (normalizar_pergunta(pergunta), versao_dados(*contexto, versao))
+
+    if cache is not None:
+        resposta = cache.obter(chave)
+        if resposta is not None:
+            yield resposta
+            return
+
+    instrucoes = INSTRUCOES_SISTEMA
+    if ferramentas:
+        instrucoes += INSTRUCOES_FERRAMENTAS.format(hoje=date.today().isoformat())
+
+    conversa = [types.Content(role="user", parts=[types.Part.from_text(text=montar_prompt(pergunta, *contexto))])]
+    partes = []
+    try:
+        for rodada in range(MAX_RODADAS_FERRAMENTAS + 1):
+            # Na última rodada as ferramentas saem, para forçar a resposta em texto
+            usar_ferramentas = bool(ferramentas) and rodada < MAX_RODADAS_FERRAMENTAS
+            config_geracao = types.GenerateContentConfig(
+                system_instruction=instrucoes,
+                tools=list(ferramentas.values()) if usar_ferramentas else None,
+                automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True)
+            )
+
+            partes_modelo, chamadas = [], []
+            fluxo = cliente.models.generate_content_stream(
+                model=MODELO_GEMINI,
+                contents=conversa,
+                config=config_geracao
+            )
+            for pedaco in fluxo:
+                if not pedaco.candidates or not pedaco.candidates[0].content:
+                    continue
+
+                for parte in pedaco.candidates[0].content.parts or []:
+                    partes_modelo.append(parte)
+                    if parte.function_call:
+                        chamadas.append(parte.function_call)
+                    elif parte.text and not parte.thought:
+                        partes.append(parte.text)
+                        yield parte.text
+
+            if not chamadas:
+                break
+
+            # Devolve as partes do modelo (com as assinaturas de raciocínio) e os resultados das ferramentas
+            conversa.append(types.Content(role="model", parts=partes_modelo))
+            conversa.append(types.Content(role="user", parts=[
+                types.Part.from_function_response(
+                    name=chamada.name,
+                    response=_executar_ferramenta(ferramentas, chamada.name, chamada.args)
+                )
+                for chamada in chamadas
+            ]))
+    except Exception as e:
+        yield f"\n\n❌ Erro ao consultar o assistente: {str(e)}"
+        return
+
+    if cache is not None and partes:
+        cache.guardar(chave, "".join(partes))
@@ -0,0 +1,244 @@
+"""
+Benchmark offline do pipeline de categorização do Dashboard Splitwise
+
+Sobe servidores HTTP locais que imitam o `get_expenses` do Splitwise e o
+endpoint de chat completions (compatível com OpenAI) do Groq, com latência,
+taxa de erro e respostas malformadas configuráveis, e mede o throughput de
+busca, categorização e agregação para grupos sintéticos.
+
+Uso:
+    python benchmark_categorizacao.py --tamanhos 100 1000 10000 100000
+"""
+
+import argparse
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pipeline_despesas as pipeline
+
+# Vocabulário para descrições sintéticas (palavra, categoria esperada)
+VOCABULARIO = [
+    (palavra, categoria)
+    for categoria, palavras in pipeline.CATEGORIAS.items()
+    for palavra in palavras
+]
+COMPLEMENTOS = ["centro", "shopping", "online", "mensal", "extra", "loja", "express", "24h"]
+
+
+def gerar_despesas(quantidade: int, proporcao_unicas: float, seed: int = 42) -> List[Dict]:
+    """Gera despesas sintéticas no formato do get_expenses do Splitwise"""
+    rng = random.Random(seed)
+    total_unicas = max(int(quantidade * proporcao_unicas), 1)
+    descricoes = []
+    for i in range(total_unicas):
+        palavra, _ = rng.choice(VOCABULARIO)
+        descricoes.append(f"{palavra.title()} {rng.choice(COMPLEMENTOS)} {i}")
+
+    hoje = datetime.now()
+    return [
+        {
+            "id": i + 1,
+            "description": rng.choice(descricoes),
+            "cost": f"{rng.uniform(5, 800):.2f}",
+            "date": (hoje - timedelta(days=rng.randint(0, 360))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "payment": False,
+            "deleted_at": None
+        }
+        for i in range(quantidade)
+    ]
+
+
+class ConfiguracaoServidor:
+    """Comportamento simulado dos servidores locais"""
+
+    def __init__(self, latencia: float, taxa_erro: float, taxa_malformado: float, seed: int = 42):
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.taxa_malformado = taxa_malformado
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.despesas: Dict[int, List[Dict]] = {}
+
+    def sortear(self, taxa: float) -> bool:
+        with self.lock:
+            return self.rng.random() < taxa
+
+
+def criar_handler(config: ConfiguracaoServidor):
+    """Cria o handler HTTP que atende Splitwise (GET) e Groq (POST)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _responder_json(self, status: int, corpo: Dict):
+            dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not url.path.endswith("/get_expenses"):
+                self._responder_json(404, {"error": "not found"})
+                return
+
+            time.sleep(config.latencia)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            despesas = config.despesas.get(int(params.get("group_id", 0)), [])
+            offset = int(params.get("offset", 0))
+            limite = int(params.get("limit", 20))
+            self._responder_json(200, {"expenses": despesas[offset:offset + limite]})
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self._responder_json(404, {"error": "not found"})
+                return
+
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(config.latencia)
+
+            if config.sortear(config.taxa_erro):
+                self._responder_json(500, {"error": "erro simulado"})
+                return
+
+            prompt = payload["messages"][0]["content"]
+            descricoes = json.loads(re.search(r"Descrições:\n(.*)\n\nIMPORTANTE", prompt, re.S).group(1))
+
+            elementos = []
+            for descricao in descricoes:
+                if config.sortear(config.taxa_malformado):
+                    elementos.append('{"descricao": ' + json.dumps(descricao, ensure_ascii=False) + ', "categoria": }')
+                    continue
+                categoria, _ = pipeline.categorizar_por_palavras_chave(descricao)
+                elementos.append(json.dumps({
+                    "descricao": descricao,
+                    "categoria": categoria.split(" ", 1)[1],
+                    "confianca": 0.9
+                }, ensure_ascii=False))
+            texto = "[" + ",\n".join(elementos) + "]"
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+
+            # Envia a resposta em pedaços, como o streaming real
+            for inicio in range(0, len(texto), 64):
+                chunk = {"choices": [{"delta": {"content": texto[inicio:inicio + 64]}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+            uso = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(texto) // 4}
+            final = {"choices": [{"delta": {}, "finish_reason": "stop"}], "usage": uso}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+
+    return Handler
+
+
+def medir(funcao, *args, **kwargs) -> Tuple[object, float]:
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def executar_cenario(quantidade: int, config: ConfiguracaoServidor, proporcao_unicas: float, diretorio: Path) -> Dict:
+    """Executa busca, categorização e agregação para um grupo sintético"""
+    group_id = quantidade
+    config.despesas[group_id] = gerar_despesas(quantidade, proporcao_unicas)
+
+    motor = pipeline.MotorDespesas(
+        "benchmark",
+        "benchmark",
+        obter_armazem=lambda gid: pipeline.ArmazemDespesas(gid, diretorio),
+        memoria=pipeline.MemoriaCategorizacoes(None),
+        criar_categorizador=lambda: pipeline.CategorizadorLocal(None, None)
+    )
+
+    # Busca: sincronização completa do armazém local
+    despesas, tempo_busca = medir(motor.buscar, {group_id: f"Grupo {quantidade}"}, 12, forcar=True)
+
+    # Categorização: tier local + Groq simulado + fallback
+    df_base = pipeline.montar_frame_despesas(despesas)
+    telemetria = pipeline.TelemetriaCategorizacao()
+    resultados, tempo_categorizacao = medir(
+        motor.categorizar,
+        df_base["descricao"].unique().tolist(),
+        telemetria=telemetria
+    )
+
+    # Agregação: colunas derivadas, cubo e índice de busca
+    def agregar():
+        df = pipeline.aplicar_categorias(df_base, resultados)
+        pipeline.calcular_cubo_agregado(df)
+        pipeline.calcular_indice_busca(df)
+        return df
+
+    _, tempo_agregacao = medir(agregar)
+
+    resumo = telemetria.resumo()
+    tempo_total = tempo_busca + tempo_categorizacao + tempo_agregacao
+    return {
+        "despesas": len(despesas),
+        "descricoes_unicas": len(resultados),
+        "busca_s": round(tempo_busca, 3),
+        "categorizacao_s": round(tempo_categorizacao, 3),
+        "agregacao_s": round(tempo_agregacao, 3),
+        "total_s": round(tempo_total, 3),
+        "despesas_por_s": round(len(despesas) / tempo_total, 1) if tempo_total else 0.0,
+        "chamadas": resumo["chamadas"],
+        "retentativas": resumo["retentativas"],
+        "taxa_fallback": resumo["taxa_fallback"]
+    }
+
+
+def main():
+    """Função principal."""
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline Splitwise + Groq")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latência simulada por requisição (s)")
+    parser.add_argument("--taxa-erro", type=float, default=0.02, help="Fração de chamadas ao LLM com HTTP 500")
+    parser.add_argument("--taxa-malformado", type=float, default=0.01, help="Fração de itens malformados na resposta")
+    parser.add_argument("--proporcao-unicas", type=float, default=0.3, help="Descrições únicas / despesas")
+    parser.add_argument("--saida", type=Path, help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+
+    config = ConfiguracaoServidor(args.latencia, args.taxa_erro, args.taxa_malformado)
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), criar_handler(config))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    # Aponta o app para os servidores locais e remove o rate limiting real
+    base_url = f"http://127.0.0.1:{servidor.server_address[1]}"
+    pipeline.SPLITWISE_API_URL = base_url
+    pipeline.GROQ_API_URL = base_url
+    pipeline.INTERVALO_ENTRE_LOTES = 0
+
+    resultados = []
+    try:
+        with tempfile.TemporaryDirectory() as diretorio:
+            for quantidade in args.tamanhos:
+                print(f"⏱️ Executando cenário com {quantidade:,} despesas...")
+                resultado = executar_cenario(quantidade, config, args.proporcao_unicas, Path(diretorio))
+                resultados.append(resultado)
+                print(f"   {json.dumps(resultado, ensure_ascii=False)}")
+    except KeyboardInterrupt:
+        print("\n⚠️ Benchmark interrompido pelo usuário")
+    finally:
+        servidor.shutdown()
+
+    if args.saida and resultados:
+        args.saida.write_text(json.dumps(resultados, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"✅ Resultados salvos em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
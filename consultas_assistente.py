@@ -0,0 +1,96 @@
+"""
+Ferramentas de consulta do assistente de IA do Sistema de Controle de Motoboys
+
+Funções expostas ao Gemini via function calling: em vez de receber o
+histórico inteiro no prompt, o modelo pede só os agregados de que precisa
+(por motoboy, por período ou de um dia) e recebe poucas linhas prontas,
+calculadas no banco sobre o resumo diário indexado.
+
+As assinaturas e docstrings viram a declaração das ferramentas, então os
+parâmetros usam tipos simples e datas em texto (AAAA-MM-DD).
+"""
+
+from datetime import date
+from typing import Callable, Dict, Tuple
+
+import dados_motoboys as dados
+
+MAX_DIAS_CONSULTA = 731  # Dois anos por chamada
+MAX_LINHAS_RESPOSTA = 40  # Acima disso o modelo recebe as primeiras linhas e o total
+AGRUPAMENTOS = ["dia", "semana", "mes", "turno", "tipo"]
+
+
+def _intervalo(data_inicio: str, data_fim: str) -> Tuple[date, date]:
+    """Valida e converte o intervalo pedido pelo modelo"""
+    try:
+        inicio, fim = date.fromisoformat(data_inicio), date.fromisoformat(data_fim)
+    except ValueError:
+        raise ValueError("Datas devem estar no formato AAAA-MM-DD")
+
+    if inicio > fim:
+        raise ValueError("data_inicio deve ser anterior ou igual a data_fim")
+    if (fim - inicio).days >= MAX_DIAS_CONSULTA:
+        raise ValueError(f"Intervalo máximo de {MAX_DIAS_CONSULTA} dias por consulta")
+    return inicio, fim
+
+
+def _limitar(linhas: list) -> Dict:
+    resposta = {"linhas": linhas[:MAX_LINHAS_RESPOSTA], "total_linhas": len(linhas)}
+    if len(linhas) > MAX_LINHAS_RESPOSTA:
+        resposta["aviso"] = "Resultado truncado; use um agrupamento maior ou um intervalo menor"
+    return resposta
+
+
+def totais_por_motoboy(data_inicio: str, data_fim: str, nome: str = "") -> Dict:
+    """
+    Totais por motoboy num intervalo: dias trabalhados, entregas e valor devido.
+
+    Args:
+        data_inicio: Primeiro dia do intervalo, no formato AAAA-MM-DD.
+        data_fim: Último dia do intervalo (inclusive), no formato AAAA-MM-DD.
+        nome: Parte do nome para filtrar motoboys; vazio traz todos.
+    """
+    inicio, fim = _intervalo(data_inicio, data_fim)
+    linhas = dados.gerar_relatorio_periodo(inicio, fim)
+
+    if nome.strip():
+        filtro = dados.normalizar_texto(nome)
+        linhas = [linha for linha in linhas if filtro in dados.normalizar_texto(linha["nome"])]
+
+    linhas = [dict(linha, valor_devido=round(linha["valor_devido"], 2)) for linha in linhas]
+    return dict(_limitar(linhas), inicio=inicio.isoformat(), fim=fim.isoformat())
+
+
+def totais_por_periodo(data_inicio: str, data_fim: str, agrupamento: str = "dia") -> Dict:
+    """
+    Totais de entregas, registros, motoboys ativos e custo num intervalo, agrupados.
+
+    Args:
+        data_inicio: Primeiro dia do intervalo, no formato AAAA-MM-DD.
+        data_fim: Último dia do intervalo (inclusive), no formato AAAA-MM-DD.
+        agrupamento: Um de "dia", "semana" (início na segunda), "mes", "turno" (Manhã/Noite) ou "tipo" (Fixo/Freelancer).
+    """
+    inicio, fim = _intervalo(data_inicio, data_fim)
+    if agrupamento not in AGRUPAMENTOS:
+        raise ValueError(f"agrupamento deve ser um de: {', '.join(AGRUPAMENTOS)}")
+
+    linhas = [dict(linha, custo=round(linha["custo"], 2)) for linha in dados.totais_agrupados(inicio, fim, agrupamento)]
+    return dict(_limitar(linhas), inicio=inicio.isoformat(), fim=fim.isoformat(), agrupamento=agrupamento)
+
+
+def indicadores_do_dia(data: str) -> Dict:
+    """
+    KPIs de um dia: entregas, motoboys, média de entregas por motoboy, custo total e custo por entrega.
+
+    Args:
+        data: Dia consultado, no formato AAAA-MM-DD.
+    """
+    dia, _ = _intervalo(data, data)
+    kpis = dados.calcular_kpis_dia(dia)
+    return {chave: round(valor, 2) if isinstance(valor, float) else valor for chave, valor in kpis.items()}
+
+
+FERRAMENTAS: Dict[str, Callable[..., Dict]] = {
+    funcao.__name__: funcao
+    for funcao in (totais_por_motoboy, totais_por_periodo, indicadores_do_dia)
+}
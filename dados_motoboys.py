@@ -0,0 +1,543 @@
+"""
+Camada de acesso a dados com cache do Sistema de Controle de Motoboys
+
+Envolve as consultas do módulo `database` com `st.cache_data`, cada uma com
+seu próprio TTL, e invalida explicitamente os caches afetados a cada
+inserção, atualização ou exclusão. Cliques que não alteram dados não fazem
+nenhuma ida ao Supabase.
+
+KPIs e relatórios por período são agregados no banco, a partir do resumo
+diário mantido por trigger (supabase/migrations), e chegam prontos em uma
+única chamada RPC.
+
+Os registros de hoje ficam na sessão (`EstadoDia`) e são corrigidos pelos
+eventos do feed de alterações (feed_registros), que trazem as mutações das
+outras sessões sem recarregar a tabela.
+
+Toda escrita em registros (individual, edição, exclusão ou lote) passa pelas
+funções de escrita deste módulo: mesma validação (`preparar_registro`), mesma
+publicação no feed e mesma invalidação de caches.
+"""
+
+import logging
+import math
+import numbers
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+from supabase import Client, create_client
+
+import database as db
+from feed_registros import FeedRegistros
+
+logger = logging.getLogger(__name__)
+
+# TTLs por consulta (segundos): cadastros mudam pouco, registros do dia mudam sempre
+TTL_NOMES = 3600
+TTL_CONFIGURACAO = 3600
+TTL_REGISTROS = 120
+TTL_KPIS = 120
+TTL_RELATORIO = 300
+TTL_RESUMO = 900
+LIMITE_PAGINA_RESUMO = 1000  # Máximo de linhas por resposta do PostgREST
+
+# Valores aceitos nos registros
+PERIODOS = ["Manhã", "Noite"]
+TIPOS = ["Fixo", "Freelancer"]
+COLUNAS_LOTE = ["nome", "data", "periodo", "tipo", "entregas"]
+
+
+@st.cache_resource
+def obter_cliente() -> Client:
+    """Cliente Supabase para as funções de agregação (RPC)"""
+    return create_client(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"])
+
+
+@st.cache_resource
+def obter_feed() -> FeedRegistros:
+    """Feed de alterações único por processo, compartilhado entre as sessões"""
+    # Eventos vindos de outras instâncias tornam os caches de consulta obsoletos
+    feed = FeedRegistros(ao_receber_remoto=lambda evento: invalidar_registros())
+
+    if st.secrets["supabase"].get("realtime", True):
+        try:
+            feed.escutar_supabase(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"])
+        except ImportError:
+            pass  # Cliente sem Realtime: fica só o feed local
+    return feed
+
+
+@st.cache_data(ttl=TTL_NOMES, show_spinner=False)
+def buscar_nomes_motoboys() -> List[str]:
+    """Nomes dos motoboys já cadastrados, para o autocomplete"""
+    return db.buscar_nomes_motoboys()
+
+
+@st.cache_data(ttl=TTL_REGISTROS, show_spinner=False)
+def buscar_registros_dia(dia: date) -> List[Dict]:
+    """Registros de um dia"""
+    return db.buscar_registros_dia(dia)
+
+
+@st.cache_data(ttl=TTL_CONFIGURACAO, show_spinner=False)
+def buscar_configuracao_ativa() -> Dict:
+    """Valores de diária e corrida em vigor"""
+    return db.buscar_configuracao_ativa()
+
+
+@st.cache_data(ttl=TTL_KPIS, show_spinner=False)
+def calcular_kpis_dia(dia: date) -> Dict:
+    """KPIs de um dia, agregados no banco"""
+    linhas = obter_cliente().rpc("kpis_dia", {"p_data": dia.isoformat()}).execute().data
+    kpis = linhas[0] if linhas else {}
+    return {
+        "total_entregas": int(kpis.get("total_entregas") or 0),
+        "total_motoboys": int(kpis.get("total_motoboys") or 0),
+        "media_entregas_moto": float(kpis.get("media_entregas_moto") or 0),
+        "custo_total": float(kpis.get("custo_total") or 0),
+        "custo_medio_entrega": float(kpis.get("custo_medio_entrega") or 0)
+    }
+
+
+@st.cache_data(ttl=TTL_RELATORIO, show_spinner=False)
+def gerar_relatorio_periodo(inicio: date, fim: date) -> List[Dict]:
+    """Consolidado por motoboy (dias trabalhados, entregas e valor devido) no intervalo"""
+    linhas = obter_cliente().rpc(
+        "relatorio_periodo",
+        {"p_inicio": inicio.isoformat(), "p_fim": fim.isoformat()}
+    ).execute().data
+    return [
+        {
+            "nome": linha["nome"],
+            "tipo": linha["tipo"],
+            "dias_trabalhados": int(linha["dias_trabalhados"]),
+            "total_entregas": int(linha["total_entregas"]),
+            "valor_devido": float(linha["valor_devido"])
+        }
+        for linha in linhas
+    ]
+
+
+@st.cache_data(ttl=TTL_RELATORIO, show_spinner=False)
+def totais_agrupados(inicio: date, fim: date, agrupamento: str) -> List[Dict]:
+    """Totais do intervalo por dia, semana, mês, turno ou tipo, agregados no banco"""
+    linhas = obter_cliente().rpc(
+        "totais_agrupados",
+        {"p_inicio": inicio.isoformat(), "p_fim": fim.isoformat(), "p_agrupamento": agrupamento}
+    ).execute().data
+    return [
+        {
+            "grupo": linha["grupo"],
+            "registros": int(linha["registros"]),
+            "entregas": int(linha["entregas"]),
+            "motoboys": int(linha["motoboys"]),
+            "custo": float(linha["custo"])
+        }
+        for linha in linhas
+    ]
+
+
+def gerar_relatorio_semanal(hoje: date) -> List[Dict]:
+    """Relatório de segunda até hoje"""
+    return gerar_relatorio_periodo(hoje - timedelta(days=hoje.weekday()), hoje)
+
+
+class EstadoDia:
+    """
+    Registros de um dia mantidos na sessão, com mutações otimistas.
+
+    Cada mutação é aplicada na hora à cópia local e enfileirada; `sincronizar`
+    envia a fila ao banco e reconcilia com a resposta (id definitivo na
+    inserção, alteração desfeita em caso de falha).
+    """
+
+    def __init__(self, dia: date, registros: List[Dict]):
+        self.dia = dia
+        self.registros = {r["id"]: dict(r) for r in registros}
+        self.pendentes: List[Tuple[str, int, Optional[Dict], Optional[Dict]]] = []
+        self.erros: List[str] = []
+        self.seq = 0  # Último evento do feed já refletido
+        self._ultimo_temporario = 0
+
+    def listar(self) -> List[Dict]:
+        return list(self.registros.values())
+
+    def _aplicar(self, chave: int, registro: Optional[Dict]):
+        """Coloca ou remove o registro da visão local; outros dias ficam de fora"""
+        if registro is not None and registro["data"] == self.dia.isoformat():
+            self.registros[chave] = registro
+        else:
+            self.registros.pop(chave, None)
+
+    def aplicar_eventos(self, eventos: List[Dict]):
+        """Corrige a visão local com eventos do feed; reaplicar um evento não muda nada"""
+        for evento in eventos:
+            if evento["tipo"] == "DELETE":
+                self.registros.pop((evento["antigo"] or {}).get("id"), None)
+            elif evento["novo"]:
+                self._aplicar(evento["novo"]["id"], dict(evento["novo"]))
+
+    def _preparar(self, nome, data_registro, periodo, tipo, entregas) -> Optional[Dict]:
+        try:
+            return preparar_registro(nome, data_registro, periodo, tipo, entregas)
+        except ValueError as e:
+            self.erros.append(f"Registro inválido: {str(e)}.")
+            return None
+
+    def inserir(self, nome: str, data_registro: date, periodo: str, tipo: str, entregas: int):
+        campos = self._preparar(nome, data_registro, periodo, tipo, entregas)
+        if campos is None:
+            return
+
+        # Ids negativos marcam registros que ainda não chegaram ao banco
+        self._ultimo_temporario -= 1
+        registro = {"id": self._ultimo_temporario, **campos}
+        self._aplicar(registro["id"], registro)
+        self.pendentes.append(("inserir", registro["id"], registro, None))
+
+    def atualizar(
+        self,
+        registro_id: int,
+        nome: str,
+        data_registro: date,
+        periodo: str,
+        tipo: str,
+        entregas: int
+    ):
+        campos = self._preparar(nome, data_registro, periodo, tipo, entregas)
+        if campos is None:
+            return
+
+        anterior = self.registros.get(registro_id)
+        registro = {"id": registro_id, **campos}
+        self._aplicar(registro_id, registro)
+        self.pendentes.append(("atualizar", registro_id, registro, anterior))
+
+    def excluir(self, registro_id: int):
+        anterior = self.registros.get(registro_id)
+        self._aplicar(registro_id, None)
+        self.pendentes.append(("excluir", registro_id, None, anterior))
+
+    def sincronizar(self) -> bool:
+        """Envia as mutações pendentes ao banco; retorna True se algo foi reconciliado"""
+        if not self.pendentes:
+            return False
+
+        pendentes, self.pendentes = self.pendentes, []
+        definitivos: Dict[int, int] = {}  # Id temporário → id gravado, para edições feitas antes da inserção chegar
+
+        for operacao, chave, registro, anterior in pendentes:
+            registro_id = definitivos.get(chave, chave)
+            if operacao != "inserir" and registro_id < 0:
+                # A inserção deste registro falhou: não há o que alterar no banco
+                self.registros.pop(chave, None)
+                continue
+
+            campos = {k: v for k, v in (registro or {}).items() if k != "id"}
+            try:
+                if operacao == "inserir":
+                    linha = inserir_registros([campos])[0]
+                    definitivos[chave] = linha["id"]
+                    self.registros.pop(chave, None)
+                    self._aplicar(linha["id"], linha)
+                elif operacao == "atualizar":
+                    self.registros.pop(chave, None)
+                    self._aplicar(registro_id, atualizar_registro(registro_id, campos, anterior))
+                else:
+                    excluir_registro(registro_id, anterior)
+                    self.registros.pop(registro_id, None)
+                continue
+            except Exception as e:
+                logger.exception(f"Falha ao {operacao} o registro {registro_id}")
+                falha = str(e)
+
+            # Desfaz a alteração otimista
+            if operacao == "inserir":
+                self.registros.pop(chave, None)
+            else:
+                self._aplicar(registro_id, dict(anterior, id=registro_id) if anterior else None)
+            nome = (registro or anterior or {}).get("nome", "")
+            self.erros.append(f"Não foi possível {operacao} o registro de {nome}: {falha}")
+
+        return True
+
+    def kpis(self, config: Dict) -> Dict:
+        """KPIs do dia calculados localmente, com a mesma regra de custo do banco"""
+        valor_diaria = float(config.get("valor_diaria", 0))
+        valor_corrida = float(config.get("valor_corrida", 0))
+        registros = self.listar()
+
+        total_entregas = sum(r["entregas"] or 0 for r in registros)
+        total_motoboys = len({r["nome"] for r in registros})
+        fixos = len({r["nome"] for r in registros if r["tipo"] == "Fixo"})
+        custo_total = fixos * valor_diaria + total_entregas * valor_corrida
+        return {
+            "total_entregas": total_entregas,
+            "total_motoboys": total_motoboys,
+            "media_entregas_moto": total_entregas / total_motoboys if total_motoboys else 0,
+            "custo_total": custo_total,
+            "custo_medio_entrega": custo_total / total_entregas if total_entregas else 0
+        }
+
+
+def obter_estado_dia() -> EstadoDia:
+    """
+    Estado de hoje da sessão, já com os eventos novos do feed aplicados.
+
+    Carrega do banco na primeira vez, a cada virada de dia ou se a sessão
+    ficou tão atrasada que o feed não tem mais os eventos que ela perdeu.
+    """
+    hoje = date.today()
+    feed = obter_feed()
+    estado = st.session_state.get("estado_dia")
+
+    if estado is not None and estado.dia == hoje:
+        eventos, ultimo_seq = feed.eventos_desde(estado.seq)
+        if eventos is not None:
+            estado.aplicar_eventos(eventos)
+            estado.seq = ultimo_seq
+            return estado
+
+    # Número lido antes da consulta: eventos concorrentes são reaplicados sem efeito
+    seq = feed.ultimo_seq
+    estado = EstadoDia(hoje, buscar_registros_dia(hoje))
+    estado.seq = seq
+    st.session_state.estado_dia = estado
+    return estado
+
+
+@st.cache_data(ttl=TTL_RESUMO, show_spinner=False)
+def buscar_resumo_mes(ano: int, mes: int) -> List[Dict]:
+    """Linhas do resumo diário (por data, motoboy, tipo e período) de um mês"""
+    inicio = date(ano, mes, 1)
+    fim = (inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    linhas, offset = [], 0
+    while True:
+        lote = (
+            obter_cliente()
+            .table("resumo_diario_motoboys")
+            .select("data,nome,tipo,periodo,registros,entregas")
+            .gte("data", inicio.isoformat())
+            .lte("data", fim.isoformat())
+            .order("data").order("nome").order("tipo").order("periodo")
+            .range(offset, offset + LIMITE_PAGINA_RESUMO - 1)
+            .execute()
+            .data
+        )
+        linhas.extend(lote)
+        if len(lote) < LIMITE_PAGINA_RESUMO:
+            return linhas
+        offset += LIMITE_PAGINA_RESUMO
+
+
+def buscar_resumo_diario(inicio: date, fim: date) -> List[Dict]:
+    """
+    Resumo diário de um intervalo qualquer.
+
+    Lido em blocos mensais cacheados: intervalos que se sobrepõem
+    reaproveitam os meses já carregados.
+    """
+    linhas = []
+    ano, mes = inicio.year, inicio.month
+    while (ano, mes) <= (fim.year, fim.month):
+        linhas.extend(buscar_resumo_mes(ano, mes))
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+    inicio_iso, fim_iso = inicio.isoformat(), fim.isoformat()
+    return [linha for linha in linhas if inicio_iso <= linha["data"] <= fim_iso]
+
+
+def invalidar_registros():
+    """Descarta tudo que é derivado dos registros de entregas"""
+    buscar_registros_dia.clear()
+    calcular_kpis_dia.clear()
+    gerar_relatorio_periodo.clear()
+    totais_agrupados.clear()
+    buscar_resumo_mes.clear()
+
+
+def preparar_registro(nome, data_registro: date, periodo: str, tipo: str, entregas) -> Dict:
+    """Valida e normaliza os campos de um registro no formato gravado (ValueError se inválido)"""
+    nome = str(nome or "").strip()
+    if isinstance(data_registro, datetime):
+        data_registro = data_registro.date()
+
+    problemas = []
+    if not nome:
+        problemas.append("nome vazio")
+    if not isinstance(data_registro, date):
+        problemas.append("data inválida")
+    if periodo not in PERIODOS:
+        problemas.append(f"período deve ser {' ou '.join(PERIODOS)}")
+    if tipo not in TIPOS:
+        problemas.append(f"tipo deve ser {' ou '.join(TIPOS)}")
+    if (
+        isinstance(entregas, bool) or not isinstance(entregas, numbers.Real)
+        or not math.isfinite(entregas) or entregas < 0 or entregas != int(entregas)
+    ):
+        problemas.append("entregas deve ser um inteiro ≥ 0")
+    if problemas:
+        raise ValueError(", ".join(problemas))
+
+    return {
+        "nome": nome,
+        "data": data_registro.isoformat(),
+        "periodo": periodo,
+        "tipo": tipo,
+        "entregas": int(entregas)
+    }
+
+
+def _publicar_alteracoes(eventos: List[Tuple[str, Optional[Dict], Optional[Dict]]]):
+    """Descarta os caches derivados dos registros e avisa as outras sessões pelo feed"""
+    # Caches antes do feed: quem vir o número novo já lê os dados novos
+    invalidar_registros()
+    # Um nome novo precisa aparecer no autocomplete
+    if any(tipo != "DELETE" for tipo, _, _ in eventos):
+        buscar_nomes_motoboys.clear()
+
+    feed = obter_feed()
+    for tipo, novo, antigo in eventos:
+        feed.publicar_local(tipo, novo, antigo)
+
+
+def inserir_registros(registros: List[Dict]) -> List[Dict]:
+    """Insere registros preparados em uma única chamada; retorna as linhas gravadas, com id"""
+    linhas = obter_cliente().table("registros").insert(registros).execute().data
+    _publicar_alteracoes([("INSERT", linha, None) for linha in linhas])
+    return linhas
+
+
+def atualizar_registro(registro_id: int, campos: Dict, anterior: Optional[Dict] = None) -> Dict:
+    """Atualiza um registro com campos preparados; retorna a linha gravada"""
+    linhas = obter_cliente().table("registros").update(campos).eq("id", registro_id).execute().data
+    if not linhas:
+        raise LookupError(f"Registro {registro_id} não encontrado")
+    _publicar_alteracoes([("UPDATE", linhas[0], anterior)])
+    return linhas[0]
+
+
+def excluir_registro(registro_id: int, anterior: Optional[Dict] = None):
+    """Exclui um registro"""
+    obter_cliente().table("registros").delete().eq("id", registro_id).execute()
+    _publicar_alteracoes([("DELETE", None, anterior or {"id": registro_id})])
+
+
+def salvar_configuracao(valor_diaria: float, valor_corrida: float) -> bool:
+    """Salva a configuração; custos dos KPIs e do relatório dependem dela"""
+    sucesso = db.salvar_configuracao(valor_diaria, valor_corrida)
+    if sucesso:
+        buscar_configuracao_ativa.clear()
+        calcular_kpis_dia.clear()
+        gerar_relatorio_periodo.clear()
+        totais_agrupados.clear()
+    return sucesso
+
+
+def normalizar_texto(texto) -> str:
+    """Minúsculas e sem acentos, para comparar cabeçalhos e opções digitadas"""
+    texto = unicodedata.normalize("NFKD", str(texto).strip().lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def converter_datas(valores: pd.Series) -> pd.Series:
+    """
+    Converte datas em AAAA-MM-DD (ou já em formato de data) e, no que sobrar,
+    em DD/MM/AAAA. Datas inválidas viram NaT.
+
+    Os formatos são tentados em ordem, nunca adivinhados por linha: com
+    dayfirst, "2026-10-05" seria lido como 10 de maio.
+    """
+    valores = valores.map(lambda v: v.strip() if isinstance(v, str) else v)
+    datas = pd.to_datetime(valores, format="ISO8601", errors="coerce")
+    restantes = datas.isna() & valores.notna()
+    if restantes.any():
+        datas[restantes] = pd.to_datetime(valores[restantes].astype(str), format="%d/%m/%Y", errors="coerce")
+    return datas
+
+
+def normalizar_planilha_lote(df: pd.DataFrame) -> pd.DataFrame:
+    """Ajusta uma planilha importada ao formato da grade de lote (colunas e tipos)"""
+    df = df.rename(columns={c: normalizar_texto(c) for c in df.columns})
+    for coluna in COLUNAS_LOTE:
+        if coluna not in df.columns:
+            df[coluna] = None
+
+    df = df[COLUNAS_LOTE].dropna(how="all").reset_index(drop=True)
+    df["data"] = converter_datas(df["data"]).dt.date
+    df["entregas"] = pd.to_numeric(df["entregas"], errors="coerce")
+
+    # Opções digitadas sem acento ou em outra caixa viram os valores canônicos
+    for coluna, opcoes in (("periodo", PERIODOS), ("tipo", TIPOS)):
+        canonicos = {normalizar_texto(o): o for o in opcoes}
+        df[coluna] = df[coluna].map(lambda v: canonicos.get(normalizar_texto(v), v) if pd.notna(v) else v)
+    return df
+
+
+def validar_registros_lote(df: pd.DataFrame) -> Tuple[List[Dict], List[str]]:
+    """
+    Valida um lote de registros (grade editável ou planilha importada).
+
+    Aceita cabeçalhos e opções sem acento ou em qualquer caixa, datas em
+    DD/MM/AAAA ou AAAA-MM-DD e ignora linhas totalmente vazias. Os erros
+    citam a linha da grade (a partir de 1), que é onde o usuário corrige; a
+    planilha importada perde as linhas vazias e o cabeçalho ao virar grade.
+
+    Returns:
+        (registros válidos prontos para inserir, mensagens de erro por linha)
+    """
+    df = df.rename(columns={c: normalizar_texto(c) for c in df.columns})
+    faltando = [c for c in COLUNAS_LOTE if c not in df.columns]
+    if faltando:
+        return [], [f"Colunas ausentes: {', '.join(faltando)}"]
+
+    # Numeração das linhas como o usuário vê na grade, antes de descartar as vazias
+    df = df[COLUNAS_LOTE].reset_index(drop=True).dropna(how="all")
+    periodos = {normalizar_texto(p): p for p in PERIODOS}
+    tipos = {normalizar_texto(t): t for t in TIPOS}
+
+    datas = converter_datas(df["data"])
+    entregas = pd.to_numeric(df["entregas"], errors="coerce")
+
+    registros, erros = [], []
+    for indice, linha in df.iterrows():
+        nome = "" if pd.isna(linha["nome"]) else str(linha["nome"]).strip()
+        periodo = periodos.get(normalizar_texto(linha["periodo"]))
+        tipo = tipos.get(normalizar_texto(linha["tipo"]))
+        qtd = entregas.loc[indice]
+
+        problemas = []
+        if not nome:
+            problemas.append("nome vazio")
+        if pd.isna(datas.loc[indice]):
+            problemas.append("data inválida")
+        if periodo is None:
+            problemas.append(f"período deve ser {' ou '.join(PERIODOS)}")
+        if tipo is None:
+            problemas.append(f"tipo deve ser {' ou '.join(TIPOS)}")
+        if not math.isfinite(qtd) or qtd < 0 or qtd != int(qtd):
+            problemas.append("entregas deve ser um inteiro ≥ 0")
+
+        if problemas:
+            erros.append(f"Linha {indice + 1} da grade: {', '.join(problemas)}")
+            continue
+
+        registros.append(preparar_registro(nome, datas.loc[indice].date(), periodo, tipo, qtd))
+
+    return registros, erros
+
+
+def inserir_registros_lote(registros: List[Dict]) -> int:
+    """Insere vários registros em uma única chamada; retorna quantos foram gravados (repassa o erro do Supabase)"""
+    if not registros:
+        return 0
+
+    try:
+        return len(inserir_registros(registros))
+    except Exception:
+        logger.exception(f"Falha ao inserir lote de {len(registros)} registros")
+        raise
@@ -0,0 +1,125 @@
+"""
+Feed de alterações da tabela de registros do Sistema de Controle de Motoboys
+
+Recebe eventos de inserção, atualização e exclusão e os guarda numa fila
+numerada, compartilhada por todas as sessões do processo. Cada sessão lê só
+os eventos posteriores ao último que aplicou e corrige sua visão do dia
+incrementalmente, sem recarregar a tabela.
+
+Fontes:
+- Supabase Realtime (postgres_changes), escutado numa thread em segundo plano
+- Local: as próprias sessões publicam as mutações confirmadas pelo banco;
+  serve para desenvolvimento, testes e bancos sem Realtime habilitado
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_HISTORICO = 1000  # Eventos mantidos; sessões mais atrasadas recarregam do banco
+ESPERA_RECONEXAO = 5  # Segundos antes de reabrir o canal Realtime
+
+
+class FeedRegistros:
+    """Fila de eventos de alteração de registros, com número de sequência"""
+
+    def __init__(self, ao_receber_remoto: Optional[Callable[[Dict], None]] = None):
+        self.eventos = deque(maxlen=TAMANHO_HISTORICO)
+        self.ultimo_seq = 0
+        self.remoto = False
+        self.ao_receber_remoto = ao_receber_remoto
+        self._lock = threading.Lock()
+
+    def publicar(self, tipo: str, novo: Optional[Dict] = None, antigo: Optional[Dict] = None) -> int:
+        """Acrescenta um evento (INSERT, UPDATE ou DELETE) e retorna seu número"""
+        with self._lock:
+            self.ultimo_seq += 1
+            self.eventos.append({"seq": self.ultimo_seq, "tipo": tipo, "novo": novo, "antigo": antigo})
+            return self.ultimo_seq
+
+    def publicar_local(self, tipo: str, novo: Optional[Dict] = None, antigo: Optional[Dict] = None):
+        """Publica uma mutação feita por esta instância; com Realtime ativo, o evento já chega pelo canal"""
+        if not self.remoto:
+            self.publicar(tipo, novo, antigo)
+
+    def eventos_desde(self, seq: int) -> Tuple[Optional[List[Dict]], int]:
+        """
+        Eventos com número maior que `seq`.
+
+        Returns:
+            (eventos, último número) — eventos é None se parte deles já saiu
+            do histórico e quem pediu precisa recarregar do banco
+        """
+        with self._lock:
+            if seq >= self.ultimo_seq:
+                return [], self.ultimo_seq
+            if not self.eventos or self.eventos[0]["seq"] > seq + 1:
+                return None, self.ultimo_seq
+            return [e for e in self.eventos if e["seq"] > seq], self.ultimo_seq
+
+    def escutar_supabase(self, url: str, key: str, tabela: str = "registros"):
+        """
+        Inicia a escuta do Supabase Realtime numa thread daemon (ImportError sem o cliente assíncrono).
+
+        O feed só deixa de publicar as mutações locais depois que o canal
+        confirma a inscrição; se o canal cair, a publicação local volta até
+        a reconexão.
+        """
+        from supabase import acreate_client
+
+        threading.Thread(
+            target=lambda: asyncio.run(self._escutar(acreate_client, url, key, tabela)),
+            name="feed-registros",
+            daemon=True
+        ).start()
+
+    async def _escutar(self, acreate_client: Callable, url: str, key: str, tabela: str):
+        while True:
+            caiu = asyncio.Event()
+            cliente = None
+            try:
+                cliente = await acreate_client(url, key)
+                canal = cliente.channel(f"feed-{tabela}")
+                canal.on_postgres_changes("*", schema="public", table=tabela, callback=self._ao_receber)
+                await canal.subscribe(lambda estado, erro=None: self._ao_mudar_estado(tabela, estado, erro, caiu))
+                await caiu.wait()
+            except Exception as e:
+                logger.warning(f"Canal Realtime caiu, reconectando: {str(e)}")
+
+            self.remoto = False
+            if cliente is not None:
+                try:
+                    await cliente.remove_all_channels()
+                except Exception:
+                    pass
+            await asyncio.sleep(ESPERA_RECONEXAO)
+
+    def _ao_mudar_estado(self, tabela: str, estado, erro: Optional[Exception], caiu: asyncio.Event):
+        """Troca entre Realtime e publicação local conforme o estado da inscrição"""
+        estado = str(getattr(estado, "value", estado)).upper()
+        if estado == "SUBSCRIBED":
+            self.remoto = True
+            logger.info(f"Escutando alterações em {tabela} via Supabase Realtime")
+        elif estado in ("CHANNEL_ERROR", "TIMED_OUT", "CLOSED"):
+            # Sem o canal, as mutações desta instância voltam a ser publicadas localmente
+            self.remoto = False
+            logger.warning(f"Canal Realtime {estado.lower()}, reconectando: {str(erro or '')}")
+            caiu.set()
+
+    def _ao_receber(self, payload: Dict):
+        """Converte o payload do postgres_changes num evento do feed"""
+        dados = payload.get("data", payload)
+        tipo = dados.get("type") or dados.get("eventType")
+        tipo = getattr(tipo, "value", tipo)
+        novo = dados.get("record") or dados.get("new") or None
+        antigo = dados.get("old_record") or dados.get("old") or None
+
+        evento = {"tipo": str(tipo).upper(), "novo": novo, "antigo": antigo}
+        # O callback descarta caches: roda antes de o número novo ficar visível
+        if self.ao_receber_remoto:
+            self.ao_receber_remoto(evento)
+        self.publicar(**evento)
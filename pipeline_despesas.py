@@ -0,0 +1,1435 @@
+"""
+Pipeline de despesas do Splitwise com categorização por IA
+
+Busca (sincronização incremental com o Splitwise), categorização (memória,
+tier local, Groq em streaming e fallback por palavras-chave) e agregação,
+sem dependência de Streamlit. Usado pelo dashboard (`app.py`), pelo
+benchmark e por jobs em lote.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).parent / ".cache"
+ESPERA_TRAVA = 10  # Segundos; uma trava mais velha que isso foi abandonada por um processo que caiu
+
+@contextmanager
+def travar_arquivo(caminho: Path):
+    """Exclusão mútua entre threads e processos (dashboard, tarefas e CLI) via arquivo .lock"""
+    trava = caminho.with_name(f"{caminho.name}.lock")
+    trava.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        try:
+            os.close(os.open(trava, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - trava.stat().st_mtime > ESPERA_TRAVA:
+                    trava.unlink(missing_ok=True)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        trava.unlink(missing_ok=True)
+
+def ler_json(caminho: Path, padrao):
+    """Lê um JSON do disco; ausente ou inválido devolve `padrao`"""
+    if not caminho.exists():
+        return padrao
+    try:
+        return json.loads(caminho.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Arquivo inválido em {caminho}: {str(e)}")
+        return padrao
+
+def gravar_json_atomico(caminho: Path, conteudo):
+    """Grava num arquivo temporário e troca de uma vez: leitores nunca veem um JSON pela metade"""
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=caminho.parent, prefix=f"{caminho.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+            json.dump(conteudo, arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho)
+    except BaseException:
+        Path(temporario).unlink(missing_ok=True)
+        raise
+
+# Categorias com emojis
+CATEGORIAS = {
+    "🏠 Moradia": ["aluguel", "condomínio", "iptu", "seguro residencial"],
+    "💡 Contas": ["luz", "água", "gás", "internet", "telefone", "energia elétrica"],
+    "🛒 Mercado": ["supermercado", "feira", "açougue", "padaria", "hortifruti"],
+    "🍽️ Alimentação": ["restaurante", "lanche", "delivery", "ifood", "uber eats", "jantar", "almoço"],
+    "🚗 Transporte": ["uber", "combustível", "gasolina", "estacionamento", "ônibus", "metrô"],
+    "🏥 Saúde": ["farmácia", "médico", "dentista", "exame", "remédio", "consulta"],
+    "🎉 Lazer": ["cinema", "show", "teatro", "viagem", "passeio", "festa", "bar"],
+    "🏡 Casa": ["móveis", "decoração", "reforma", "manutenção", "limpeza"],
+    "👤 Pessoal": ["roupa", "cabelo", "estética", "academia", "beleza"],
+    "💻 Tecnologia": ["eletrônico", "streaming", "netflix", "spotify", "software"],
+    "🐾 Pet": ["veterinário", "ração", "pet shop", "banho e tosa"],
+    "📦 Outros": []
+}
+
+CATEGORIA_NOMES = list(CATEGORIAS.keys())
+
+# Endpoints das APIs (sobrescritos pelo benchmark para apontar para servidores locais)
+SPLITWISE_API_URL = "https://secure.splitwise.com/api/v3.0"
+GROQ_API_URL = "https://api.groq.com/openai/v1"
+INTERVALO_ENTRE_LOTES = 0.5  # Rate limiting entre chamadas ao Groq (segundos)
+MODELO_CATEGORIZACAO = "llama-3.3-70b-versatile"
+MODELO_REVISAO = "openai/gpt-oss-120b"  # Segunda passada, mais forte, só para itens de baixa confiança
+
+# Função de categorização por palavras-chave (fallback)
+def categorizar_por_palavras_chave(descricao: str) -> Tuple[str, float]:
+    """Categoriza descrição usando palavras-chave como fallback"""
+    descricao_lower = descricao.lower()
+
+    for categoria, palavras in CATEGORIAS.items():
+        for palavra in palavras:
+            if palavra in descricao_lower:
+                return categoria, 0.6  # Confiança média para fallback
+
+    return "📦 Outros", 0.3  # Baixa confiança para categoria genérica
+
+# Categorizador local (vizinho mais próximo sobre n-gramas de caracteres)
+HISTORICO_CATEGORIAS_PATH = CACHE_DIR / "categorizacoes_confirmadas.json"  # Só confirmações do usuário
+HISTORICO_MODELO_PATH = CACHE_DIR / "categorizacoes_modelo.json"  # Respostas confiáveis do LLM, guardadas à parte
+LIMIAR_CONFIANCA_LOCAL = 0.8  # Abaixo disso o item é enviado para o Groq
+PESO_EXEMPLOS_MODELO = 0.85  # Exemplos do LLM votam com peso menor: sozinhos, só quase-duplicatas passam do limiar
+DIMENSAO_HASH = 2 ** 16
+MAX_EXEMPLOS_LOCAL = 10000  # Por origem, para o histórico em disco não crescer sem limite
+
+def normalizar_texto(texto: str) -> str:
+    """Remove acentos, converte para minúsculas e colapsa espaços"""
+    sem_acento = unicodedata.normalize("NFKD", texto or "")
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return " ".join(sem_acento.lower().split())
+
+def vetorizar_descricao(descricao: str, n: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """Vetor esparso (colunas, pesos) por hashing de n-gramas de caracteres, normalizado L2"""
+    texto = f" {normalizar_texto(descricao)} "
+    hashes = [zlib.crc32(texto[j:j + n].encode("utf-8")) % DIMENSAO_HASH for j in range(max(len(texto) - n + 1, 1))]
+    colunas, contagens = np.unique(np.array(hashes, dtype=np.int64), return_counts=True)
+
+    # TF sublinear para reduzir o peso de n-gramas repetidos
+    pesos = np.log1p(contagens).astype(np.float32)
+    return colunas, pesos / np.linalg.norm(pesos)
+
+class IndiceNgramas:
+    """Índice invertido n-grama → exemplos; a memória cresce com os n-gramas, não com exemplos x DIMENSAO_HASH"""
+
+    def __init__(self, exemplos: Dict[str, str], exemplos_modelo: Dict[str, str]):
+        # Confirmações do usuário prevalecem sobre a resposta do modelo para a mesma descrição
+        modelo = {chave: categoria for chave, categoria in exemplos_modelo.items() if chave not in exemplos}
+        self.categorias = list(exemplos.values()) + list(modelo.values())
+        self.pesos = np.concatenate([
+            np.ones(len(exemplos), dtype=np.float32),
+            np.full(len(modelo), PESO_EXEMPLOS_MODELO, dtype=np.float32)
+        ])
+
+        vetores = [vetorizar_descricao(chave) for chave in list(exemplos) + list(modelo)]
+        colunas = np.concatenate([c for c, _ in vetores]) if vetores else np.zeros(0, dtype=np.int64)
+        ordem = np.argsort(colunas, kind="stable")
+        self.exemplos = np.concatenate([
+            np.full(len(c), i, dtype=np.int32) for i, (c, _) in enumerate(vetores)
+        ])[ordem] if vetores else np.zeros(0, dtype=np.int32)
+        self.valores = np.concatenate([v for _, v in vetores])[ordem] if vetores else np.zeros(0, dtype=np.float32)
+        # Postagens da coluna c em inicio[c]:inicio[c + 1]
+        self.inicio = np.searchsorted(colunas[ordem], np.arange(DIMENSAO_HASH + 1))
+
+    def similares(self, descricao: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(exemplos, similaridade de cosseno) dos exemplos com algum n-grama em comum"""
+        colunas, pesos = vetorizar_descricao(descricao)
+        inicios = self.inicio[colunas]
+        comprimentos = self.inicio[colunas + 1] - inicios
+        total = int(comprimentos.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+        # Concatena as listas de postagens das colunas da consulta
+        posicoes = np.repeat(inicios - np.cumsum(comprimentos) + comprimentos, comprimentos) + np.arange(total)
+        candidatos, inverso = np.unique(self.exemplos[posicoes], return_inverse=True)
+        similaridades = np.bincount(inverso, weights=self.valores[posicoes] * np.repeat(pesos, comprimentos))
+        return candidatos, similaridades
+
+# Índices montados, por arquivos de origem: reaproveitados até os arquivos mudarem
+_indices_locais: Dict[Tuple[str, str], Tuple[Tuple, Dict[str, str], Dict[str, str], IndiceNgramas]] = {}
+_trava_indices = threading.Lock()
+
+class CategorizadorLocal:
+    """Categoriza offline por similaridade com categorizações já confirmadas
+
+    Os exemplos vêm de dois arquivos: as confirmações do usuário e as
+    respostas de alta confiança do LLM, que votam com PESO_EXEMPLOS_MODELO
+    para que erros do modelo não virem verdade e se reforcem. O índice é
+    montado uma vez por versão desses arquivos e compartilhado entre as
+    instâncias do processo.
+    """
+
+    def __init__(
+        self,
+        caminho: Optional[Path] = HISTORICO_CATEGORIAS_PATH,
+        caminho_modelo: Optional[Path] = HISTORICO_MODELO_PATH
+    ):
+        self.caminho = caminho
+        self.caminho_modelo = caminho_modelo
+        self.exemplos: Dict[str, str] = {}
+        self.exemplos_modelo: Dict[str, str] = {}
+        self._alteracoes: Dict[str, str] = {}
+        self._alteracoes_modelo: Dict[str, str] = {}
+        self._versao: Optional[Tuple] = None  # Versão dos arquivos lidos; None após alterações em memória
+        self._indice: Optional[IndiceNgramas] = None
+        self.carregar()
+
+    def _versao_arquivos(self) -> Optional[Tuple]:
+        if not self.caminho and not self.caminho_modelo:
+            return None
+        versao = []
+        for caminho in (self.caminho, self.caminho_modelo):
+            try:
+                estado = caminho.stat() if caminho else None
+            except FileNotFoundError:
+                estado = None
+            versao.append((estado.st_mtime_ns, estado.st_size) if estado else None)
+        return tuple(versao)
+
+    def carregar(self):
+        """Carrega os exemplos do disco, reaproveitando o índice se os arquivos não mudaram"""
+        self._indice = None
+        self._versao = self._versao_arquivos()
+        if self._versao is None:
+            return
+
+        with _trava_indices:
+            em_cache = _indices_locais.get((str(self.caminho), str(self.caminho_modelo)))
+        if em_cache is not None and em_cache[0] == self._versao:
+            _, exemplos, exemplos_modelo, self._indice = em_cache
+            self.exemplos, self.exemplos_modelo = dict(exemplos), dict(exemplos_modelo)
+            return
+
+        self.exemplos = ler_json(self.caminho, {}) if self.caminho else {}
+        self.exemplos_modelo = ler_json(self.caminho_modelo, {}) if self.caminho_modelo else {}
+
+    def salvar(self):
+        """Persiste os exemplos novos sobre o que está em disco (outros processos podem ter gravado)"""
+        alterou = False
+        for caminho, alteracoes in ((self.caminho, self._alteracoes), (self.caminho_modelo, self._alteracoes_modelo)):
+            if not caminho or not alteracoes:
+                continue
+            with travar_arquivo(caminho):
+                exemplos = ler_json(caminho, {})
+                for chave, categoria in alteracoes.items():
+                    exemplos.pop(chave, None)
+                    exemplos[chave] = categoria
+                while len(exemplos) > MAX_EXEMPLOS_LOCAL:
+                    exemplos.pop(next(iter(exemplos)))
+                gravar_json_atomico(caminho, exemplos)
+            alterou = True
+
+        self._alteracoes, self._alteracoes_modelo = {}, {}
+        if alterou:
+            self.carregar()
+
+    def adicionar(self, descricao: str, categoria: str):
+        """Registra uma categorização confirmada pelo usuário"""
+        self._registrar(self.exemplos, self._alteracoes, descricao, categoria)
+
+    def adicionar_do_modelo(self, descricao: str, categoria: str):
+        """Registra uma resposta de alta confiança do LLM, que vota com peso menor"""
+        self._registrar(self.exemplos_modelo, self._alteracoes_modelo, descricao, categoria)
+
+    def _registrar(self, exemplos: Dict[str, str], alteracoes: Dict[str, str], descricao: str, categoria: str):
+        chave = normalizar_texto(descricao)
+        if chave and categoria in CATEGORIA_NOMES:
+            # Reinsere para que a ordem reflita o uso mais recente
+            exemplos.pop(chave, None)
+            exemplos[chave] = categoria
+            alteracoes.pop(chave, None)
+            alteracoes[chave] = categoria
+            while len(exemplos) > MAX_EXEMPLOS_LOCAL:
+                exemplos.pop(next(iter(exemplos)))
+            self._versao = None
+            self._indice = None
+
+    def _obter_indice(self) -> IndiceNgramas:
+        if self._indice is not None:
+            return self._indice
+        if self._versao is None:
+            # Exemplos só em memória (ou alterados desde a leitura): índice próprio
+            self._indice = IndiceNgramas(self.exemplos, self.exemplos_modelo)
+            return self._indice
+
+        chave = (str(self.caminho), str(self.caminho_modelo))
+        with _trava_indices:
+            em_cache = _indices_locais.get(chave)
+            if em_cache is None or em_cache[0] != self._versao:
+                # Uma montagem por versão dos arquivos, mesmo com tarefas em paralelo
+                em_cache = (self._versao, dict(self.exemplos), dict(self.exemplos_modelo), IndiceNgramas(self.exemplos, self.exemplos_modelo))
+                _indices_locais[chave] = em_cache
+        self._indice = em_cache[3]
+        return self._indice
+
+    def categorizar(self, descricoes: List[str], k: int = 5) -> List[Tuple[Optional[str], float]]:
+        """Retorna (categoria, confianca) pelo voto ponderado dos k vizinhos mais similares"""
+        if not (self.exemplos or self.exemplos_modelo) or not descricoes:
+            return [(None, 0.0)] * len(descricoes)
+
+        indice = self._obter_indice()
+        resultados = []
+        for descricao in descricoes:
+            candidatos, similaridades = indice.similares(descricao)
+            # Exemplos vindos do modelo pesam menos que as confirmações
+            similaridades = similaridades * indice.pesos[candidatos]
+            if len(candidatos) > k:
+                vizinhos = np.argpartition(-similaridades, k - 1)[:k]
+                candidatos, similaridades = candidatos[vizinhos], similaridades[vizinhos]
+
+            votos: Dict[str, float] = {}
+            melhores: Dict[str, float] = {}
+            for j, similaridade in zip(candidatos, similaridades):
+                categoria = indice.categorias[j]
+                votos[categoria] = votos.get(categoria, 0.0) + float(similaridade)
+                melhores[categoria] = max(melhores.get(categoria, 0.0), float(similaridade))
+
+            if not votos:
+                resultados.append((None, 0.0))
+                continue
+
+            categoria = max(votos, key=votos.get)
+            # Confiança = similaridade máxima da categoria vencedora x fração dos votos
+            melhor = melhores[categoria]
+            if melhor <= 0:
+                resultados.append((None, 0.0))
+                continue
+
+            confianca = melhor * (votos[categoria] / sum(votos.values()))
+            resultados.append((categoria, round(confianca, 2)))
+
+        return resultados
+
+def buscar_grupos(api_key: str) -> List[Dict]:
+    """Busca grupos do Splitwise"""
+    headers = {"Authorization": f"Bearer {api_key}"}
+    response = requests.get(
+        f"{SPLITWISE_API_URL}/get_groups",
+        headers=headers,
+        timeout=10
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data.get("groups", [])
+
+# Armazém local de despesas sincronizado incrementalmente com o Splitwise
+DESPESAS_CACHE_DIR = CACHE_DIR / "despesas"
+MAX_MESES = 24  # Janela máxima do slider; a carga inicial cobre toda ela
+INTERVALO_SINCRONIZACAO = timedelta(minutes=5)
+LIMITE_PAGINA = 500
+
+class ArmazemDespesas:
+    """Despesas de um grupo indexadas por id, persistidas em disco"""
+
+    def __init__(self, group_id: int, diretorio: Path = DESPESAS_CACHE_DIR):
+        self.group_id = group_id
+        self.caminho = diretorio / f"grupo_{group_id}.json"
+        self.despesas: Dict[str, Dict] = {}
+        self.ultima_sincronizacao: Optional[datetime] = None
+        self.lock = threading.Lock()
+        self.carregar()
+
+    def carregar(self):
+        """Carrega o armazém do disco, se existir"""
+        if not self.caminho.exists():
+            return
+        try:
+            conteudo = json.loads(self.caminho.read_text(encoding="utf-8"))
+            self.despesas = conteudo.get("despesas", {})
+            ultima = conteudo.get("ultima_sincronizacao")
+            self.ultima_sincronizacao = datetime.fromisoformat(ultima) if ultima else None
+        except (OSError, ValueError):
+            self.despesas, self.ultima_sincronizacao = {}, None
+
+    def salvar(self):
+        """Persiste o armazém em disco"""
+        conteudo = {
+            "ultima_sincronizacao": self.ultima_sincronizacao.isoformat() if self.ultima_sincronizacao else None,
+            "despesas": self.despesas
+        }
+        gravar_json_atomico(self.caminho, conteudo)
+
+    def aplicar(self, despesas: List[Dict]):
+        """Insere/atualiza despesas e remove as excluídas (deleted_at preenchido)"""
+        for despesa in despesas:
+            chave = str(despesa["id"])
+            if despesa.get("deleted_at"):
+                self.despesas.pop(chave, None)
+            else:
+                self.despesas[chave] = despesa
+
+    def sincronizar(self, api_key: str, forcar: bool = False):
+        """Busca só o que mudou desde a última sincronização (updated_after)"""
+        with self.lock:
+            agora = datetime.now(timezone.utc)
+            if not forcar and self.ultima_sincronizacao and agora - self.ultima_sincronizacao < INTERVALO_SINCRONIZACAO:
+                return
+
+            if self.ultima_sincronizacao:
+                params = {"updated_after": self.ultima_sincronizacao.strftime("%Y-%m-%dT%H:%M:%SZ")}
+            else:
+                data_inicio = agora - timedelta(days=MAX_MESES * 30)
+                params = {"dated_after": data_inicio.strftime("%Y-%m-%d")}
+
+            self.aplicar(buscar_paginas_despesas(api_key, self.group_id, params))
+            self.ultima_sincronizacao = agora
+            self.salvar()
+
+    def consultar(self, meses: int) -> List[Dict]:
+        """Despesas (sem pagamentos) datadas nos últimos `meses` meses"""
+        data_inicio = (datetime.now() - timedelta(days=meses * 30)).strftime("%Y-%m-%d")
+        # O armazém é compartilhado entre sessões: copia sob o lock para não iterar durante uma sincronização
+        with self.lock:
+            despesas = list(self.despesas.values())
+        return [
+            d for d in despesas
+            if not d.get("payment", False) and (d.get("date") or "")[:10] >= data_inicio
+        ]
+
+def buscar_paginas_despesas(api_key: str, group_id: int, params: Dict) -> List[Dict]:
+    """Busca todas as páginas de get_expenses para os filtros informados"""
+    headers = {"Authorization": f"Bearer {api_key}"}
+    despesas = []
+    offset = 0
+
+    while True:
+        response = requests.get(
+            f"{SPLITWISE_API_URL}/get_expenses",
+            headers=headers,
+            params={"group_id": group_id, "limit": LIMITE_PAGINA, "offset": offset, **params},
+            timeout=15
+        )
+        response.raise_for_status()
+        pagina = response.json().get("expenses", [])
+        despesas.extend(pagina)
+
+        if len(pagina) < LIMITE_PAGINA:
+            return despesas
+        offset += LIMITE_PAGINA
+
+def _fim_objeto_json(buffer: str, inicio: int) -> int:
+    """Posição após o `}` que fecha o objeto iniciado em `inicio`, ignorando chaves dentro de strings (-1 se ainda aberto)"""
+    profundidade, em_string, escapado = 0, False, False
+    for i in range(inicio, len(buffer)):
+        c = buffer[i]
+        if em_string:
+            if escapado:
+                escapado = False
+            elif c == "\\":
+                escapado = True
+            elif c == '"':
+                em_string = False
+        elif c == '"':
+            em_string = True
+        elif c == "{":
+            profundidade += 1
+        elif c == "}":
+            profundidade -= 1
+            if profundidade == 0:
+                return i + 1
+    return -1
+
+def extrair_objetos_json(buffer: str, posicao: int = 0, final: bool = False) -> Tuple[List[Dict], int]:
+    """Extrai objetos JSON completos de um buffer parcial (array ou JSON-lines)"""
+    decoder = json.JSONDecoder()
+    objetos = []
+
+    while True:
+        inicio = buffer.find("{", posicao)
+        if inicio == -1:
+            return objetos, len(buffer) if final else posicao
+
+        try:
+            objeto, fim = decoder.raw_decode(buffer, inicio)
+        except json.JSONDecodeError:
+            fim_objeto = _fim_objeto_json(buffer, inicio)
+            if fim_objeto != -1:
+                # Fechado mas malformado: pula o objeto inteiro
+                posicao = fim_objeto
+                continue
+            if not final:
+                # Incompleto: aguarda mais tokens
+                return objetos, inicio
+            # Fim do fluxo com objeto aberto: tenta o próximo
+            proximo = buffer.find("{", inicio + 1)
+            if proximo == -1:
+                return objetos, len(buffer)
+            posicao = proximo
+            continue
+
+        if isinstance(objeto, dict):
+            objetos.append(objeto)
+        posicao = fim
+
+def normalizar_categorizacao(cat: Dict, descricoes: set) -> Optional[Dict]:
+    """Valida um item devolvido pelo LLM e adiciona o emoji à categoria"""
+    try:
+        descricao = cat["descricao"]
+        nome_sem_emoji = str(cat["categoria"]).strip()
+        confianca = min(max(float(cat["confianca"]), 0.0), 1.0)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    if descricao not in descricoes or not nome_sem_emoji:
+        return None
+
+    for cat_completa in CATEGORIA_NOMES:
+        if nome_sem_emoji in cat_completa:
+            return {"descricao": descricao, "categoria": cat_completa, "confianca": confianca}
+
+    return None
+
+def montar_prompt_categorizacao(descricoes: List[str]) -> str:
+    """Monta o prompt de categorização enviado ao LLM"""
+    return f"""Você é um assistente especializado em categorizar despesas financeiras.
+
+Categorias disponíveis:
+{', '.join([c.split(' ', 1)[1] for c in CATEGORIA_NOMES])}
+
+Analise as seguintes descrições de despesas e retorne um JSON array com objetos contendo:
+- "descricao": a descrição original
+- "categoria": a categoria (apenas o nome, sem emoji)
+- "confianca": número entre 0 e 1 indicando confiança
+
+Descrições:
+{json.dumps(descricoes, ensure_ascii=False)}
+
+IMPORTANTE: Retorne APENAS o JSON array, sem markdown, sem explicações, sem blocos de código."""
+
+# Orçamento de tokens por chamada ao Groq
+MAX_TOKENS_RESPOSTA = 4096
+MAX_TOKENS_PROMPT = 8000
+MARGEM_SEGURANCA = 0.8  # Fração do orçamento efetivamente usada
+
+class OrcamentoTokens:
+    """Empacota descrições em lotes pelo orçamento de tokens, aprendendo com o uso real"""
+
+    def __init__(self, chars_por_token: float = 3.5, tokens_fixos_por_item: float = 25.0, alpha: float = 0.3):
+        self.chars_por_token = chars_por_token
+        self.tokens_fixos_por_item = tokens_fixos_por_item
+        self.alpha = alpha  # Peso da observação mais recente na média móvel
+        self.tokens_prompt_base = len(montar_prompt_categorizacao([])) / chars_por_token
+
+    def tokens_item_prompt(self, descricao: str) -> float:
+        # Descrição serializada + aspas e separador
+        return (len(json.dumps(descricao, ensure_ascii=False)) + 2) / self.chars_por_token
+
+    def tokens_item_resposta(self, descricao: str) -> float:
+        # O LLM ecoa a descrição e acrescenta categoria/confiança
+        return len(descricao) / self.chars_por_token + self.tokens_fixos_por_item
+
+    def proximo_lote(self, pendentes: List[str]) -> List[str]:
+        """Retorna o maior prefixo de `pendentes` que cabe no orçamento (mínimo 1 item)"""
+        limite_prompt = MAX_TOKENS_PROMPT * MARGEM_SEGURANCA - self.tokens_prompt_base
+        limite_resposta = MAX_TOKENS_RESPOSTA * MARGEM_SEGURANCA
+        soma_prompt = soma_resposta = 0.0
+
+        for n, descricao in enumerate(pendentes):
+            soma_prompt += self.tokens_item_prompt(descricao)
+            soma_resposta += self.tokens_item_resposta(descricao)
+            if n > 0 and (soma_prompt > limite_prompt or soma_resposta > limite_resposta):
+                return pendentes[:n]
+
+        return pendentes
+
+    def registrar_uso(self, descricoes: List[str], uso: Dict, truncado: bool = False):
+        """Atualiza as estimativas com o `usage` devolvido pela API"""
+        if not descricoes:
+            return
+
+        tokens_prompt = uso.get("prompt_tokens")
+        if tokens_prompt:
+            chars = len(montar_prompt_categorizacao(descricoes))
+            self._atualizar("chars_por_token", chars / tokens_prompt)
+            self.tokens_prompt_base = len(montar_prompt_categorizacao([])) / self.chars_por_token
+
+        tokens_resposta = uso.get("completion_tokens")
+        if tokens_resposta:
+            eco = sum(len(d) for d in descricoes) / self.chars_por_token
+            observado = max((tokens_resposta - eco) / len(descricoes), 1.0)
+            if truncado:
+                # Resposta cortada por max_tokens: o custo real por item é maior que o observado
+                observado = max(observado, self.tokens_fixos_por_item) * 1.25
+            self._atualizar("tokens_fixos_por_item", observado)
+
+    def _atualizar(self, atributo: str, observado: float):
+        atual = getattr(self, atributo)
+        setattr(self, atributo, (1 - self.alpha) * atual + self.alpha * observado)
+
+# Telemetria de custo e latência da categorização
+TELEMETRIA_PATH = CACHE_DIR / "telemetria_categorizacao.jsonl"
+MAX_REGISTROS_TELEMETRIA = 500  # Execuções mantidas no histórico; o arquivo é podado ao passar do dobro
+
+_trava_telemetria = threading.Lock()
+_historico_telemetria: Dict[Tuple[str, int], Tuple[Tuple[int, int], pd.DataFrame]] = {}
+
+class TelemetriaCategorizacao:
+    """Acumula métricas de uma execução: chamadas, latência, tokens e origem dos resultados"""
+
+    def __init__(self):
+        self.inicio = time.time()
+        self.duracao: Optional[float] = None
+        self.latencias: List[float] = []
+        self.chamadas = 0
+        self.erros = 0
+        self.retentativas = 0
+        self.tokens_prompt = 0
+        self.tokens_resposta = 0
+        self.itens_local = 0
+        self.itens_groq = 0
+        self.itens_fallback = 0
+        self.lock = threading.Lock()
+
+    def registrar_chamada(self, latencia: float, uso: Dict, erro: bool = False):
+        with self.lock:
+            self.chamadas += 1
+            self.erros += int(erro)
+            self.latencias.append(latencia)
+            self.tokens_prompt += int(uso.get("prompt_tokens") or 0)
+            self.tokens_resposta += int(uso.get("completion_tokens") or 0)
+
+    def registrar_itens(self, local: int = 0, groq: int = 0, fallback: int = 0, retentativas: int = 0):
+        with self.lock:
+            self.itens_local += local
+            self.itens_groq += groq
+            self.itens_fallback += fallback
+            self.retentativas += retentativas
+
+    def finalizar(self):
+        self.duracao = time.time() - self.inicio
+
+    def resumo(self) -> Dict:
+        """Métricas agregadas da execução"""
+        with self.lock:
+            total_itens = self.itens_local + self.itens_groq + self.itens_fallback
+            latencias = np.array(self.latencias) if self.latencias else np.zeros(1)
+            return {
+                "timestamp": datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+                "duracao_s": round(self.duracao if self.duracao is not None else time.time() - self.inicio, 2),
+                "chamadas": self.chamadas,
+                "erros": self.erros,
+                "retentativas": self.retentativas,
+                "latencia_media_s": round(float(latencias.mean()), 2),
+                "latencia_p95_s": round(float(np.percentile(latencias, 95)), 2),
+                "tokens_prompt": self.tokens_prompt,
+                "tokens_resposta": self.tokens_resposta,
+                "itens": total_itens,
+                "taxa_cache_local": round(self.itens_local / total_itens, 3) if total_itens else 0.0,
+                "taxa_fallback": round(self.itens_fallback / total_itens, 3) if total_itens else 0.0
+            }
+
+    def salvar(self, caminho: Path = TELEMETRIA_PATH, maximo: int = MAX_REGISTROS_TELEMETRIA):
+        """Acrescenta o resumo da execução ao histórico (JSON-lines), que guarda só as últimas `maximo`"""
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        with _trava_telemetria:
+            with open(caminho, "a", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps(self.resumo(), ensure_ascii=False) + "\n")
+
+            linhas = _ler_ultimas_linhas(caminho, 2 * maximo + 1)
+            if len(linhas) > 2 * maximo:
+                temporario = caminho.with_name(f"{caminho.name}.{os.getpid()}.tmp")
+                temporario.write_text("".join(f"{linha}\n" for linha in linhas[-maximo:]), encoding="utf-8")
+                os.replace(temporario, caminho)
+
+def _ler_ultimas_linhas(caminho: Path, quantidade: int, bloco: int = 65536) -> List[str]:
+    """Últimas `quantidade` linhas, lendo o arquivo de trás para frente"""
+    with open(caminho, "rb") as arquivo:
+        posicao = arquivo.seek(0, os.SEEK_END)
+        conteudo = b""
+        while posicao > 0 and conteudo.count(b"\n") <= quantidade:
+            passo = min(bloco, posicao)
+            posicao -= passo
+            arquivo.seek(posicao)
+            conteudo = arquivo.read(passo) + conteudo
+    return conteudo.decode("utf-8", errors="replace").splitlines()[-quantidade:]
+
+def carregar_historico_telemetria(caminho: Path = TELEMETRIA_PATH, limite: int = 200) -> pd.DataFrame:
+    """Lê as últimas execuções registradas para análise de tendência; relido só quando o arquivo muda"""
+    try:
+        estado = caminho.stat()
+    except FileNotFoundError:
+        return pd.DataFrame()
+
+    versao = (estado.st_mtime_ns, estado.st_size)
+    chave = (str(caminho), limite)
+    em_cache = _historico_telemetria.get(chave)
+    if em_cache is not None and em_cache[0] == versao:
+        return em_cache[1]
+
+    registros = []
+    for linha in _ler_ultimas_linhas(caminho, limite):
+        try:
+            registros.append(json.loads(linha))
+        except ValueError:
+            continue
+    historico = pd.DataFrame(registros)
+    _historico_telemetria[chave] = (versao, historico)
+    return historico
+
+def categorizar_com_groq(
+    descricoes: List[str],
+    api_key: str,
+    ao_receber: Optional[Callable[[Dict], None]] = None,
+    orcamento: Optional[OrcamentoTokens] = None,
+    telemetria: Optional[TelemetriaCategorizacao] = None,
+    modelo: str = MODELO_CATEGORIZACAO,
+    ao_aviso: Optional[Callable[[str], None]] = None
+) -> List[Dict]:
+    """Categoriza descrições usando Groq API em modo streaming
+
+    Cada item válido é entregue a `ao_receber` assim que chega; itens
+    malformados são descartados individualmente, sem perder o lote inteiro.
+    O `usage` da resposta, quando presente, alimenta o `orcamento` e a
+    `telemetria`. Falhas são reportadas a `ao_aviso` (padrão: logging).
+    """
+    categorizacoes = []
+    inicio = time.perf_counter()
+    uso = {}
+
+    try:
+        prompt = montar_prompt_categorizacao(descricoes)
+
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "model": modelo,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3,
+            "max_tokens": MAX_TOKENS_RESPOSTA,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+
+        descricoes_validas = set(descricoes)
+        recebidas = set()
+        buffer = ""
+        posicao = 0
+        truncado = False
+
+        def consumir(final: bool = False):
+            nonlocal posicao
+            objetos, posicao = extrair_objetos_json(buffer, posicao, final)
+            for objeto in objetos:
+                cat = normalizar_categorizacao(objeto, descricoes_validas)
+                if cat is None or cat["descricao"] in recebidas:
+                    continue
+                recebidas.add(cat["descricao"])
+                categorizacoes.append(cat)
+                if ao_receber:
+                    ao_receber(cat)
+
+        with requests.post(
+            f"{GROQ_API_URL}/chat/completions",
+            headers=headers,
+            json=payload,
+            timeout=30,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+
+            # Server-sent events: uma linha "data: {...}" por chunk
+            # Decodifica como UTF-8 explicitamente: text/event-stream sem charset
+            # faria o requests assumir ISO-8859-1 e corromper acentos
+            for linha_bytes in response.iter_lines():
+                linha = linha_bytes.decode("utf-8")
+                if not linha or not linha.startswith("data:"):
+                    continue
+                conteudo = linha[len("data:"):].strip()
+                if conteudo == "[DONE]":
+                    break
+
+                chunk = json.loads(conteudo)
+
+                # O usage chega no último chunk (padrão OpenAI ou extensão x_groq)
+                uso = chunk.get("usage") or chunk.get("x_groq", {}).get("usage") or uso
+
+                for escolha in chunk.get("choices", []):
+                    truncado = truncado or escolha.get("finish_reason") == "length"
+                    delta = escolha.get("delta", {}).get("content") or ""
+                    if delta:
+                        buffer += delta
+                        consumir()
+
+        consumir(final=True)
+
+        if orcamento and uso:
+            orcamento.registrar_uso(descricoes, uso, truncado)
+        if telemetria:
+            telemetria.registrar_chamada(time.perf_counter() - inicio, uso)
+        return categorizacoes
+    except Exception as e:
+        if telemetria:
+            telemetria.registrar_chamada(time.perf_counter() - inicio, uso, erro=True)
+        (ao_aviso or logger.warning)(f"Erro na categorização com IA: {str(e)}. Usando fallback.")
+        return categorizacoes
+
+def montar_frame_despesas(despesas: List[Dict]) -> pd.DataFrame:
+    """Monta o frame coluna a coluna direto do JSON do Splitwise"""
+    df = pd.DataFrame({
+        "descricao": [d.get("description", "Sem descrição") for d in despesas],
+        "grupo": [d.get("grupo_nome", "") for d in despesas],
+        "valor": pd.to_numeric([d.get("cost", 0) for d in despesas], errors="coerce"),
+        "data": pd.to_datetime([d.get("date") or None for d in despesas], errors="coerce", utc=True, format="ISO8601")
+    })
+    df["valor"] = df["valor"].fillna(0.0)
+    df["data"] = df["data"].dt.tz_localize(None)
+    return df
+
+# Memória de categorizações entre execuções e fila de revisão
+MEMORIA_CATEGORIAS_PATH = CACHE_DIR / "memoria_categorizacoes.json"
+LIMIAR_REVISAO = 0.5  # Abaixo disso o item volta para a fila de revisão
+
+class MemoriaCategorizacoes:
+    """Resultados de execuções anteriores e categorias confirmadas pelo usuário
+
+    Confirmações do usuário são verdade absoluta (confiança 1.0) e nunca são
+    recalculadas; resultados anteriores só voltam ao LLM se tiverem baixa
+    confiança.
+    """
+
+    def __init__(self, caminho: Optional[Path] = MEMORIA_CATEGORIAS_PATH):
+        self.caminho = caminho
+        self.confirmadas: Dict[str, str] = {}
+        self.resultados: Dict[str, Tuple[str, float]] = {}
+        self._confirmadas_novas: Dict[str, str] = {}
+        self._resultados_novos: Dict[str, Tuple[str, float]] = {}
+        self.lock = threading.Lock()
+        self.carregar()
+
+    def carregar(self):
+        """Carrega a memória do disco, se existir"""
+        if not self.caminho:
+            return
+        conteudo = ler_json(self.caminho, {})
+        self.confirmadas = conteudo.get("confirmadas", {})
+        self.resultados = {d: tuple(r) for d, r in conteudo.get("resultados", {}).items()}
+
+    def salvar(self):
+        """Persiste o que mudou desde a última gravação sobre o conteúdo atual do disco
+
+        Dashboard, tarefas e o CLI noturno gravam o mesmo arquivo: recarregar e
+        mesclar sob a trava evita que um apague as confirmações do outro.
+        """
+        if not self.caminho:
+            return
+        with self.lock, travar_arquivo(self.caminho):
+            conteudo = ler_json(self.caminho, {})
+            confirmadas = {**conteudo.get("confirmadas", {}), **self._confirmadas_novas}
+            resultados = {d: tuple(r) for d, r in conteudo.get("resultados", {}).items()}
+            resultados.update({d: r for d, r in self._resultados_novos.items() if d not in confirmadas})
+            gravar_json_atomico(self.caminho, {"confirmadas": confirmadas, "resultados": resultados})
+
+            self.confirmadas, self.resultados = confirmadas, resultados
+            self._confirmadas_novas, self._resultados_novos = {}, {}
+
+    def confirmacoes(self, descricoes: List[str]) -> Dict[str, str]:
+        """Categorias confirmadas pelo usuário para as descrições informadas"""
+        with self.lock:
+            return {d: self.confirmadas[d] for d in descricoes if d in self.confirmadas}
+
+    def confirmar(self, descricao: str, categoria: str):
+        """Registra a categoria confirmada pelo usuário"""
+        with self.lock:
+            self.confirmadas[descricao] = categoria
+            self._confirmadas_novas[descricao] = categoria
+
+    def registrar(self, resultados: Dict[str, Tuple[str, float]]):
+        """Guarda os resultados de uma execução (confirmações não são sobrescritas)"""
+        with self.lock:
+            for descricao, resultado in resultados.items():
+                if descricao not in self.confirmadas:
+                    self.resultados[descricao] = resultado
+                    self._resultados_novos[descricao] = resultado
+
+    def classificar(self, descricoes: List[str]) -> Tuple[Dict[str, Tuple[str, float]], List[str], List[str]]:
+        """Separa as descrições em (resolvidas, a revisar, novas)"""
+        resolvidas, revisar, novas = {}, [], []
+        with self.lock:
+            for descricao in descricoes:
+                if descricao in self.confirmadas:
+                    resolvidas[descricao] = (self.confirmadas[descricao], 1.0)
+                elif descricao not in self.resultados:
+                    novas.append(descricao)
+                elif self.resultados[descricao][1] >= LIMIAR_REVISAO:
+                    resolvidas[descricao] = self.resultados[descricao]
+                else:
+                    revisar.append(descricao)
+        return resolvidas, revisar, novas
+
+def categorizar_descricoes(
+    descricoes: List[str],
+    groq_api_key: str,
+    orcamento: OrcamentoTokens,
+    resultados: Optional[Dict[str, Tuple[str, float]]] = None,
+    ao_progredir: Optional[Callable[[int, int, str], None]] = None,
+    telemetria: Optional[TelemetriaCategorizacao] = None,
+    categorizador: Optional[CategorizadorLocal] = None,
+    memoria: Optional[MemoriaCategorizacoes] = None,
+    ao_aviso: Optional[Callable[[str], None]] = None
+) -> Dict[str, Tuple[str, float]]:
+    """Categoriza descrições únicas gastando LLM apenas onde é necessário
+
+    Ordem: confirmações do usuário e resultados anteriores confiáveis (memória),
+    tier local, Groq em lotes para itens novos, segunda passada com modelo mais
+    forte para itens de baixa confiança e, por fim, fallback por palavras-chave.
+    Os resultados são gravados em `resultados` à medida que chegam, para que
+    quem chama possa exibi-los ou persisti-los antes do fim da execução.
+    """
+    resultados = {} if resultados is None else resultados
+    telemetria = telemetria or TelemetriaCategorizacao()
+    memoria = memoria or MemoriaCategorizacoes()
+
+    # Memória: confirmações e resultados anteriores não voltam ao LLM
+    resolvidas, revisar, novas = memoria.classificar(descricoes)
+    resultados.update(resolvidas)
+
+    # Itens em revisão partem do resultado anterior e só são trocados por algo melhor
+    for desc in revisar:
+        resultados[desc] = memoria.resultados[desc]
+
+    # Tier local: resolve offline o que for similar a categorizações já confirmadas
+    categorizador = categorizador or CategorizadorLocal()
+    descricoes_para_categorizar = []
+
+    for desc, (categoria, confianca) in zip(novas, categorizador.categorizar(novas)):
+        if categoria is not None and confianca >= LIMIAR_CONFIANCA_LOCAL:
+            resultados[desc] = (categoria, confianca)
+        else:
+            descricoes_para_categorizar.append(desc)
+
+    telemetria.registrar_itens(local=len(descricoes) - len(descricoes_para_categorizar) - len(revisar))
+
+    def aplicar_categorizacao(cat: Dict):
+        anterior = resultados.get(cat["descricao"])
+        if anterior is not None and anterior[1] >= cat["confianca"]:
+            return
+        resultados[cat["descricao"]] = (cat["categoria"], cat["confianca"])
+
+        # Respostas de alta confiança alimentam o tier local, à parte das confirmações do usuário
+        if cat["confianca"] >= LIMIAR_CONFIANCA_LOCAL:
+            categorizador.adicionar_do_modelo(cat["descricao"], cat["categoria"])
+
+    total = len(descricoes_para_categorizar) + len(revisar)
+    processadas = 0
+    batch_num = 0
+
+    def categorizar_lotes(pendentes: List[str], modelo: str, rotulo: str):
+        nonlocal processadas, batch_num
+
+        # Lotes dimensionados pelo orçamento de tokens, que aprende entre execuções
+        while pendentes:
+            batch = orcamento.proximo_lote(pendentes)
+            pendentes = pendentes[len(batch):]
+            batch_num += 1
+
+            if ao_progredir:
+                ao_progredir(processadas, total, f"{rotulo} lote {batch_num} ({len(batch)} itens)...")
+
+            # Tentar categorizar com Groq, aplicando cada item assim que chega
+            recebidas = {
+                cat["descricao"]
+                for cat in categorizar_com_groq(batch, groq_api_key, aplicar_categorizacao, orcamento, telemetria, modelo, ao_aviso)
+            }
+
+            # Falha parcial: reenvia apenas os itens que faltaram
+            faltantes = [desc for desc in batch if desc not in recebidas]
+            if recebidas and faltantes:
+                telemetria.registrar_itens(retentativas=1)
+                recebidas.update(
+                    cat["descricao"]
+                    for cat in categorizar_com_groq(faltantes, groq_api_key, aplicar_categorizacao, orcamento, telemetria, modelo, ao_aviso)
+                )
+                faltantes = [desc for desc in faltantes if desc not in recebidas]
+
+            # Fallback para palavras-chave (itens em revisão mantêm o resultado anterior)
+            for desc in faltantes:
+                if desc not in resultados:
+                    resultados[desc] = categorizar_por_palavras_chave(desc)
+
+            telemetria.registrar_itens(groq=len(recebidas), fallback=len(faltantes))
+            processadas += len(batch)
+
+            # Rate limiting
+            time.sleep(INTERVALO_ENTRE_LOTES)
+
+    categorizar_lotes(descricoes_para_categorizar, MODELO_CATEGORIZACAO, "Categorizando")
+    categorizar_lotes(revisar, MODELO_REVISAO, "Revisando")
+
+    if ao_progredir:
+        ao_progredir(processadas, total, "Categorização concluída")
+
+    # Itens que o Groq não devolveu ficam com o fallback por palavras-chave
+    for desc in descricoes:
+        if desc not in resultados:
+            resultados[desc] = categorizar_por_palavras_chave(desc)
+            telemetria.registrar_itens(fallback=1)
+
+    categorizador.salvar()
+    memoria.registrar({desc: resultados[desc] for desc in descricoes})
+    memoria.salvar()
+
+    telemetria.finalizar()
+    return resultados
+
+def confirmar_categorias(confirmacoes: Dict[str, str], memoria: Optional[MemoriaCategorizacoes] = None):
+    """Grava categorias confirmadas pelo usuário na memória e no tier local"""
+    memoria = memoria or MemoriaCategorizacoes()
+    categorizador = CategorizadorLocal()
+
+    for descricao, categoria in confirmacoes.items():
+        memoria.confirmar(descricao, categoria)
+        categorizador.adicionar(descricao, categoria)
+
+    memoria.salvar()
+    categorizador.salvar()
+
+def aplicar_categorias(df: pd.DataFrame, resultados: Dict[str, Tuple[str, float]]) -> pd.DataFrame:
+    """Mapeia os resultados por descrição para as linhas já categorizadas do df"""
+    df = df[df["descricao"].isin(resultados.keys())].reset_index(drop=True)
+    df["categoria"] = df["descricao"].map({d: c for d, (c, _) in resultados.items()})
+    df["confianca"] = df["descricao"].map({d: float(conf) for d, (_, conf) in resultados.items()})
+    return adicionar_colunas_derivadas(df)
+
+class MotorDespesas:
+    """Pipeline busca → categorização → agregação sem dependência de interface
+
+    Os caches são plugáveis: `obter_armazem` fornece o armazém de cada grupo,
+    `memoria` e `criar_categorizador` definem onde os resultados persistem e
+    `orcamento` pode ser compartilhado entre execuções. Avisos vão para o
+    `ao_aviso` da chamada (ou, na falta dele, o do motor, que por padrão é o
+    logging) e o progresso para o callback passado a cada chamada.
+    """
+
+    def __init__(
+        self,
+        splitwise_api_key: str,
+        groq_api_key: str,
+        obter_armazem: Callable[[int], ArmazemDespesas] = ArmazemDespesas,
+        memoria: Optional[MemoriaCategorizacoes] = None,
+        criar_categorizador: Callable[[], CategorizadorLocal] = CategorizadorLocal,
+        orcamento: Optional[OrcamentoTokens] = None,
+        ao_aviso: Optional[Callable[[str], None]] = None
+    ):
+        self.splitwise_api_key = splitwise_api_key
+        self.groq_api_key = groq_api_key
+        self.obter_armazem = obter_armazem
+        self.memoria = memoria
+        self.criar_categorizador = criar_categorizador
+        self.orcamento = orcamento or OrcamentoTokens()
+        self.ao_aviso = ao_aviso or logger.warning
+
+    def buscar_grupos(self) -> List[Dict]:
+        """Busca grupos do Splitwise"""
+        return buscar_grupos(self.splitwise_api_key)
+
+    def buscar(
+        self,
+        grupos: Dict[int, str],
+        meses: int,
+        forcar: bool = False,
+        ao_aviso: Optional[Callable[[str], None]] = None
+    ) -> List[Dict]:
+        """Sincroniza vários grupos em paralelo e retorna as despesas marcadas com o nome do grupo"""
+        ao_aviso = ao_aviso or self.ao_aviso
+        armazens = {group_id: self.obter_armazem(group_id) for group_id in grupos}
+
+        with ThreadPoolExecutor(max_workers=min(len(armazens), 8) or 1) as executor:
+            futuros = {
+                group_id: executor.submit(armazem.sincronizar, self.splitwise_api_key, forcar)
+                for group_id, armazem in armazens.items()
+            }
+
+        despesas = []
+        for group_id, futuro in futuros.items():
+            erro = futuro.exception()
+            if erro is not None:
+                ao_aviso(f"Erro ao buscar despesas do grupo {grupos[group_id]}: {str(erro)}")
+                if armazens[group_id].despesas:
+                    ao_aviso(f"Exibindo despesas da última sincronização do grupo {grupos[group_id]}.")
+
+            despesas.extend({**d, "grupo_nome": grupos[group_id]} for d in armazens[group_id].consultar(meses))
+
+        return despesas
+
+    def categorizar(
+        self,
+        descricoes: List[str],
+        resultados: Optional[Dict[str, Tuple[str, float]]] = None,
+        ao_progredir: Optional[Callable[[int, int, str], None]] = None,
+        telemetria: Optional[TelemetriaCategorizacao] = None,
+        ao_aviso: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Tuple[str, float]]:
+        """Categoriza descrições únicas usando os caches configurados"""
+        return categorizar_descricoes(
+            descricoes,
+            self.groq_api_key,
+            self.orcamento,
+            resultados=resultados,
+            ao_progredir=ao_progredir,
+            telemetria=telemetria,
+            categorizador=self.criar_categorizador(),
+            memoria=self.memoria or MemoriaCategorizacoes(),
+            ao_aviso=ao_aviso or self.ao_aviso
+        )
+
+    def processar(
+        self,
+        despesas: List[Dict],
+        ao_progredir: Optional[Callable[[int, int, str], None]] = None,
+        telemetria: Optional[TelemetriaCategorizacao] = None
+    ) -> pd.DataFrame:
+        """Monta, categoriza e enriquece o frame de despesas"""
+        if not despesas:
+            return pd.DataFrame()
+
+        df = montar_frame_despesas(despesas)
+        resultados = self.categorizar(df["descricao"].unique().tolist(), ao_progredir=ao_progredir, telemetria=telemetria)
+        return aplicar_categorias(df, resultados)
+
+# Categorização em segundo plano, desacoplada de quem a solicitou
+TAREFAS_CACHE_DIR = CACHE_DIR / "tarefas"
+MAX_TAREFAS_SIMULTANEAS = 2
+
+class TarefaCategorizacao:
+    """Job de categorização com progresso e resultados parciais persistidos em disco"""
+
+    def __init__(self, tarefa_id: str, despesas: List[Dict], diretorio: Path = TAREFAS_CACHE_DIR):
+        self.id = tarefa_id
+        self.despesas = despesas
+        self.caminho = diretorio / f"{tarefa_id}.json"
+        self.status = "pendente"
+        self.mensagem = ""
+        self.processadas = 0
+        self.total = 0
+        self.erro: Optional[str] = None
+        self.resultados: Dict[str, Tuple[str, float]] = {}
+        self.avisos: List[str] = []
+        self.telemetria = TelemetriaCategorizacao()
+        self.lock = threading.Lock()
+        self.carregar()
+
+    @property
+    def em_andamento(self) -> bool:
+        return self.status in ("pendente", "executando")
+
+    def carregar(self):
+        """Recupera resultados parciais de uma execução anterior"""
+        if not self.caminho.exists():
+            return
+        try:
+            conteudo = json.loads(self.caminho.read_text(encoding="utf-8"))
+            self.resultados = {d: tuple(r) for d, r in conteudo.get("resultados", {}).items()}
+        except (OSError, ValueError):
+            self.resultados = {}
+
+    def salvar(self):
+        """Persiste status e resultados parciais"""
+        with self.lock:
+            conteudo = {
+                "status": self.status,
+                "processadas": self.processadas,
+                "total": self.total,
+                "erro": self.erro,
+                "resultados": dict(self.resultados)
+            }
+        gravar_json_atomico(self.caminho, conteudo)
+
+    def avisar(self, mensagem: str):
+        """Guarda o aviso para o painel exibir: a thread da tarefa não tem contexto do Streamlit"""
+        logger.warning(mensagem)
+        with self.lock:
+            if mensagem not in self.avisos:
+                self.avisos.append(mensagem)
+
+    def listar_avisos(self) -> List[str]:
+        with self.lock:
+            return list(self.avisos)
+
+    def descartar(self):
+        """Remove os resultados parciais do disco; a próxima submissão recomeça pela memória"""
+        self.caminho.unlink(missing_ok=True)
+
+    def atualizar_progresso(self, processadas: int, total: int, mensagem: str):
+        with self.lock:
+            self.processadas, self.total, self.mensagem = processadas, total, mensagem
+        self.salvar()
+
+    def montar_frame(self) -> pd.DataFrame:
+        """Frame com as linhas já categorizadas até agora"""
+        with self.lock:
+            resultados = dict(self.resultados)
+        if not self.despesas or not resultados:
+            return pd.DataFrame()
+        return aplicar_categorias(montar_frame_despesas(self.despesas), resultados)
+
+class GerenciadorTarefas:
+    """Fila local de tarefas executadas por um pool de threads do processo"""
+
+    def __init__(self, max_workers: int = MAX_TAREFAS_SIMULTANEAS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="categorizacao")
+        self.tarefas: Dict[str, TarefaCategorizacao] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def gerar_id(despesas: List[Dict]) -> str:
+        """Id determinístico: o mesmo conjunto de despesas (ids e descrições) retoma a mesma tarefa"""
+        chaves = sorted({(str(d.get("id")), d.get("description", "Sem descrição")) for d in despesas})
+        return hashlib.sha256(json.dumps(chaves, ensure_ascii=False).encode("utf-8")).hexdigest()[:32]
+
+    def submeter(self, despesas: List[Dict], motor: "MotorDespesas") -> TarefaCategorizacao:
+        """Enfileira a categorização, reaproveitando tarefa em andamento ou resultados salvos"""
+        tarefa_id = self.gerar_id(despesas)
+
+        with self.lock:
+            tarefa = self.tarefas.get(tarefa_id)
+            if tarefa and tarefa.em_andamento:
+                return tarefa
+
+            tarefa = TarefaCategorizacao(tarefa_id, despesas)
+            self.tarefas[tarefa_id] = tarefa
+
+        self.executor.submit(self._executar, tarefa, motor)
+        return tarefa
+
+    def obter(self, tarefa_id: str) -> Optional[TarefaCategorizacao]:
+        with self.lock:
+            return self.tarefas.get(tarefa_id)
+
+    def _executar(self, tarefa: TarefaCategorizacao, motor: "MotorDespesas"):
+        tarefa.status = "executando"
+        try:
+            descricoes = list(dict.fromkeys(d.get("description", "Sem descrição") for d in tarefa.despesas))
+
+            # Resultados de uma execução interrompida: confirmações feitas depois prevalecem
+            # e os de baixa confiança voltam ao pipeline (inclusive à segunda passada)
+            memoria = motor.memoria or MemoriaCategorizacoes()
+            with tarefa.lock:
+                for descricao, categoria in memoria.confirmacoes(descricoes).items():
+                    tarefa.resultados[descricao] = (categoria, 1.0)
+                pendentes = [
+                    d for d in descricoes
+                    if d not in tarefa.resultados or tarefa.resultados[d][1] < LIMIAR_REVISAO
+                ]
+
+            motor.categorizar(
+                pendentes,
+                resultados=tarefa.resultados,
+                ao_progredir=tarefa.atualizar_progresso,
+                telemetria=tarefa.telemetria,
+                ao_aviso=tarefa.avisar
+            )
+            tarefa.status = "concluida"
+        except Exception as e:
+            tarefa.status = "erro"
+            tarefa.erro = str(e)
+        finally:
+            tarefa.telemetria.finalizar()
+            tarefa.telemetria.salvar()
+            # Concluída, a tarefa não precisa mais ser retomada; manter o arquivo
+            # devolveria resultados antigos sem passar pela memória
+            if tarefa.status == "concluida":
+                tarefa.descartar()
+            else:
+                tarefa.salvar()
+
+def formatar_moeda_serie(valores: pd.Series) -> pd.Series:
+    """Formata valores como moeda brasileira (R$ 1.234,56) de forma vetorizada"""
+    if valores.empty:
+        # Sem linhas, o split não gera as colunas 0 e 1
+        return pd.Series([], index=valores.index, dtype=object)
+    texto = pd.Series(np.char.mod("%.2f", valores.abs().to_numpy(dtype=float)), index=valores.index)
+    partes = texto.str.split(".", n=1, expand=True)
+    inteiro = partes[0].str.replace(r"\B(?=(\d{3})+(?!\d))", ".", regex=True)
+    sinal = pd.Series(np.where(valores < 0, "-", ""), index=valores.index)
+    return "R$ " + sinal + inteiro + "," + partes[1]
+
+def adicionar_colunas_derivadas(df: pd.DataFrame) -> pd.DataFrame:
+    """Adiciona mês, faixas de confiança e colunas formatadas para exibição"""
+    # Sem data, o mês fica nulo (e não o texto "NaT") para os gráficos mensais poderem descartá-lo
+    datadas = df["data"].notna()
+    df["mes"] = None
+    df.loc[datadas, "mes"] = df.loc[datadas, "data"].dt.to_period("M").astype(str)
+    df["status_confianca"] = np.select(
+        [df["confianca"] >= 0.8, df["confianca"] >= 0.5],
+        ["Alta (≥80%)", "Média (50-79%)"],
+        default="Baixa (<50%)"
+    )
+    df["confianca_percentual"] = (df["confianca"] * 100).round(1)
+
+    # Colunas formatadas para exibição
+    df["data_formatada"] = df["data"].dt.strftime("%d/%m/%Y")
+    df["valor_formatado"] = formatar_moeda_serie(df["valor"])
+    df["confianca_formatada"] = df["confianca_percentual"].astype(str) + "%"
+
+    return df
+
+# Agregados pré-computados para métricas e gráficos
+def calcular_cubo_agregado(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega o df em grupo x mês x categoria (valor, quantidade e contagens de confiança)"""
+    return (
+        df.assign(alta=df["confianca"] >= 0.8, revisar=df["confianca"] < 0.5)
+        .groupby(["grupo", "mes", "categoria"], dropna=False, observed=True)
+        .agg(
+            valor=("valor", "sum"),
+            quantidade=("valor", "size"),
+            alta=("alta", "sum"),
+            revisar=("revisar", "sum")
+        )
+        .reset_index()
+    )
+
+class IndiceBusca:
+    """Índice invertido de trigramas sobre as descrições (sem acento, minúsculas)"""
+
+    def __init__(self, descricoes: pd.Series):
+        codigos, unicas = pd.factorize(descricoes.fillna("").map(normalizar_texto))
+        self.codigos = codigos
+        self.unicas: List[str] = list(unicas)
+        self.trigramas: Dict[str, set] = {}
+
+        for i, texto in enumerate(self.unicas):
+            for j in range(len(texto) - 2):
+                self.trigramas.setdefault(texto[j:j + 3], set()).add(i)
+
+    def buscar(self, consulta: str) -> np.ndarray:
+        """Retorna a máscara booleana das linhas cuja descrição contém `consulta`"""
+        termo = normalizar_texto(consulta)
+        if not termo:
+            return np.ones(len(self.codigos), dtype=bool)
+
+        if len(termo) >= 3:
+            # Interseção das listas de trigramas, da menor para a maior
+            listas = sorted(
+                (self.trigramas.get(termo[j:j + 3], set()) for j in range(len(termo) - 2)),
+                key=len
+            )
+            candidatos = set.intersection(*listas) if listas[0] else set()
+        else:
+            candidatos = range(len(self.unicas))
+
+        # Confirma a substring apenas nos candidatos
+        encontrados = [i for i in candidatos if termo in self.unicas[i]]
+        return np.isin(self.codigos, encontrados)
+
+def calcular_indice_busca(df: pd.DataFrame) -> IndiceBusca:
+    """Constrói o índice de busca das descrições do df"""
+    return IndiceBusca(df["descricao"])
+
+def calcular_ordem_data(df: pd.DataFrame) -> np.ndarray:
+    """Posições do df ordenadas por data decrescente (datas ausentes no fim)"""
+    return df["data"].reset_index(drop=True).sort_values(ascending=False, kind="stable").index.to_numpy()
+
+
+# Exportação
+TAMANHO_BLOCO_CSV = 5000
+
+def gerar_csv(df: pd.DataFrame) -> bytes:
+    """Serializa o df em CSV por blocos (UTF-8 com BOM)"""
+    buffer = io.BytesIO()
+    buffer.write("\ufeff".encode("utf-8"))  # BOM, equivalente ao utf-8-sig
+
+    for inicio in range(0, len(df), TAMANHO_BLOCO_CSV):
+        bloco = df.iloc[inicio:inicio + TAMANHO_BLOCO_CSV]
+        buffer.write(bloco.to_csv(index=False, header=inicio == 0).encode("utf-8"))
+
+    return buffer.getvalue()
+
+# Snapshots colunares pré-computados (Arrow IPC, lidos por memory-map)
+SNAPSHOTS_DIR = CACHE_DIR / "snapshots"
+
+def chave_snapshot(grupos: List[int], meses: int) -> str:
+    """Identificador do snapshot para um conjunto de grupos e período"""
+    return f"grupos_{'-'.join(str(g) for g in sorted(grupos))}_meses_{meses}"
+
+def salvar_snapshot(
+    df: pd.DataFrame,
+    grupos: Dict[int, str],
+    meses: int,
+    diretorio: Path = SNAPSHOTS_DIR
+) -> Path:
+    """Grava df categorizado e cubo agregado em arquivos Arrow IPC sem compressão"""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    destino = diretorio / chave_snapshot(list(grupos), meses)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    # Sem manifesto o snapshot é ignorado: ele sai antes dos arquivos Arrow e só
+    # volta, gravado de forma atômica, depois que os dois foram trocados
+    caminho_manifesto = destino / "manifesto.json"
+    caminho_manifesto.unlink(missing_ok=True)
+    for nome, frame in (("despesas", df), ("cubo", calcular_cubo_agregado(df))):
+        tabela = pa.Table.from_pandas(frame, preserve_index=False)
+        temporario = destino / f"{nome}.arrow.tmp"
+        feather.write_feather(tabela, temporario, compression="uncompressed")
+        temporario.replace(destino / f"{nome}.arrow")
+
+    manifesto = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "grupos": {str(g): nome for g, nome in grupos.items()},
+        "meses": meses,
+        "linhas": len(df)
+    }
+    gravar_json_atomico(caminho_manifesto, manifesto)
+    return destino
+
+def carregar_snapshot(
+    grupos: List[int],
+    meses: int,
+    idade_maxima: Optional[timedelta] = None,
+    diretorio: Path = SNAPSHOTS_DIR
+) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, Dict]]:
+    """Lê (df, cubo, manifesto) de um snapshot via memory-map, se existir e estiver fresco"""
+    import pyarrow.feather as feather
+
+    origem = diretorio / chave_snapshot(grupos, meses)
+    caminho_manifesto = origem / "manifesto.json"
+    if not caminho_manifesto.exists():
+        return None
+
+    try:
+        manifesto = json.loads(caminho_manifesto.read_text(encoding="utf-8"))
+        if idade_maxima and datetime.now() - datetime.fromisoformat(manifesto["gerado_em"]) > idade_maxima:
+            return None
+
+        df = feather.read_table(origem / "despesas.arrow", memory_map=True).to_pandas()
+        cubo = feather.read_table(origem / "cubo.arrow", memory_map=True).to_pandas()
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Snapshot inválido em {origem}: {str(e)}")
+        return None
+
+    return df, cubo, manifesto
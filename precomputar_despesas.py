@@ -0,0 +1,93 @@
+"""
+Pré-computação noturna das despesas categorizadas do Dashboard Splitwise
+
+Executa o pipeline completo (busca, categorização e agregação) para os grupos
+configurados e grava snapshots colunares que o dashboard carrega via
+memory-map na abertura, sem esperar pela busca e pela IA.
+
+As chaves são lidas das variáveis de ambiente ou do arquivo .env na pasta do
+projeto: SPLITWISE_API_KEY e GROQ_API_KEY.
+
+Uso:
+    python precomputar_despesas.py --grupos 123 456 --meses 6 12
+    python precomputar_despesas.py --todos-grupos
+
+Agendamento (cron, todos os dias às 3h):
+    0 3 * * * cd /caminho/do/projeto && python precomputar_despesas.py --todos-grupos
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict
+
+from dotenv import load_dotenv
+
+import pipeline_despesas as pipeline
+
+
+def carregar_chaves() -> Dict[str, str]:
+    """Carrega as API keys do ambiente ou do .env do projeto"""
+    load_dotenv(Path(__file__).parent / ".env")
+    chaves = {nome: os.getenv(nome, "") for nome in ("SPLITWISE_API_KEY", "GROQ_API_KEY")}
+
+    faltando = [nome for nome, valor in chaves.items() if not valor]
+    if faltando:
+        raise RuntimeError(f"Variáveis não configuradas: {', '.join(faltando)}")
+    return chaves
+
+
+def main():
+    """Função principal."""
+    parser = argparse.ArgumentParser(description="Pré-computa snapshots de despesas categorizadas")
+    parser.add_argument("--grupos", type=int, nargs="+", help="IDs dos grupos do Splitwise")
+    parser.add_argument("--todos-grupos", action="store_true", help="Processa todos os grupos da conta")
+    parser.add_argument("--meses", type=int, nargs="+", default=[6], help="Períodos a pré-computar")
+    parser.add_argument("--combinado", action="store_true", help="Gera também o snapshot com todos os grupos juntos")
+    args = parser.parse_args()
+    if not args.grupos and not args.todos_grupos:
+        parser.error("informe --grupos ou --todos-grupos")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        chaves = carregar_chaves()
+        motor = pipeline.MotorDespesas(chaves["SPLITWISE_API_KEY"], chaves["GROQ_API_KEY"])
+
+        grupos = {g["id"]: g["name"] for g in motor.buscar_grupos()}
+        if not args.todos_grupos:
+            grupos = {g: grupos.get(g, str(g)) for g in args.grupos}
+
+        # Um snapshot por grupo (modo grupo único) e, opcionalmente, o combinado (multigrupo)
+        selecoes = [{g: nome} for g, nome in grupos.items()]
+        if args.combinado and len(grupos) > 1:
+            selecoes.append(grupos)
+
+        for meses in args.meses:
+            for selecao in selecoes:
+                nomes = ", ".join(selecao.values())
+                print(f"🔄 Processando {nomes} ({meses} meses)...")
+
+                despesas = motor.buscar(selecao, meses, forcar=True)
+                if not despesas:
+                    print(f"⚠️ Nenhuma despesa encontrada para {nomes}")
+                    continue
+
+                df = motor.processar(despesas)
+                destino = pipeline.salvar_snapshot(df, selecao, meses)
+                print(f"✅ {len(df)} despesas salvas em {destino}")
+
+    except KeyboardInterrupt:
+        print("\n⚠️ Pré-computação interrompida pelo usuário")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ ERRO FATAL: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
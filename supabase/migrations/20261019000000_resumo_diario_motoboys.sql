@@ -0,0 +1,147 @@
+-- Resumo diário pré-agregado do Sistema de Controle de Motoboys
+--
+-- Mantém em `resumo_diario_motoboys` uma linha por (data, nome, tipo, período)
+-- com a contagem de registros e a soma de entregas. Um trigger aplica o delta
+-- de cada insert/update/delete em `registros`, então o resumo nunca precisa
+-- ser reconstruído e os KPIs do dia e o relatório semanal custam uma leitura
+-- pequena, independente do tamanho do histórico.
+--
+-- Schema assumido (o mesmo usado pelo database.py):
+--   registros(id, nome, data date, periodo text, tipo text, entregas int)
+--   configuracoes(valor_diaria numeric, valor_corrida numeric, ativa bool, created_at timestamptz)
+--
+-- Regra de custo (a mesma do relatório do database.py): motoboy fixo recebe
+-- uma diária por dia trabalhado, qualquer que seja o número de períodos, mais
+-- as corridas; freelancer recebe apenas as corridas. Os valores vêm da
+-- configuração ativa no momento da consulta.
+--
+-- O resumo fica fechado por RLS, sem políticas e sem grants para anon e
+-- authenticated: o trigger e as funções de leitura são `security definer`, e o
+-- app só chega aos números pelas RPCs abaixo.
+
+create table if not exists resumo_diario_motoboys (
+    data date not null,
+    nome text not null,
+    tipo text not null,
+    periodo text not null,
+    registros integer not null default 0,
+    entregas integer not null default 0,
+    primary key (data, nome, tipo, periodo)
+);
+
+create index if not exists resumo_diario_motoboys_nome_data
+    on resumo_diario_motoboys (nome, data);
+
+alter table resumo_diario_motoboys enable row level security;
+revoke all on resumo_diario_motoboys from anon, authenticated;
+
+-- Aplica +1/-1 registro (e as entregas correspondentes) a uma linha do resumo;
+-- entregas nulas contam como zero para a linha nunca ficar nula
+create or replace function aplicar_delta_resumo(
+    p_data date, p_nome text, p_tipo text, p_periodo text, p_sinal integer, p_entregas integer
+) returns void language plpgsql security definer set search_path = public as $$
+begin
+    insert into resumo_diario_motoboys as r (data, nome, tipo, periodo, registros, entregas)
+    values (p_data, p_nome, p_tipo, p_periodo, p_sinal, p_sinal * coalesce(p_entregas, 0))
+    on conflict (data, nome, tipo, periodo) do update
+        set registros = r.registros + excluded.registros,
+            entregas = r.entregas + excluded.entregas;
+
+    delete from resumo_diario_motoboys
+    where data = p_data and nome = p_nome and tipo = p_tipo and periodo = p_periodo
+      and registros <= 0;
+end;
+$$;
+
+revoke execute on function aplicar_delta_resumo(date, text, text, text, integer, integer) from public, anon, authenticated;
+
+create or replace function atualizar_resumo_diario() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform aplicar_delta_resumo(old.data, old.nome, old.tipo, old.periodo, -1, old.entregas);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform aplicar_delta_resumo(new.data, new.nome, new.tipo, new.periodo, 1, new.entregas);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists registros_resumo_diario on registros;
+create trigger registros_resumo_diario
+    after insert or update or delete on registros
+    for each row execute function atualizar_resumo_diario();
+
+-- Carga inicial a partir do histórico existente
+insert into resumo_diario_motoboys (data, nome, tipo, periodo, registros, entregas)
+select data, nome, tipo, periodo, count(*), coalesce(sum(entregas), 0)
+from registros
+group by data, nome, tipo, periodo
+on conflict (data, nome, tipo, periodo) do update
+    set registros = excluded.registros,
+        entregas = excluded.entregas;
+
+-- Valores da configuração ativa
+create or replace function configuracao_vigente(out valor_diaria numeric, out valor_corrida numeric)
+language sql stable as $$
+    select coalesce(max(c.valor_diaria), 0), coalesce(max(c.valor_corrida), 0)
+    from (
+        select valor_diaria, valor_corrida
+        from configuracoes
+        where ativa
+        order by created_at desc
+        limit 1
+    ) c;
+$$;
+
+-- KPIs de um dia
+create or replace function kpis_dia(p_data date)
+returns table (
+    total_entregas bigint,
+    total_motoboys bigint,
+    media_entregas_moto numeric,
+    custo_total numeric,
+    custo_medio_entrega numeric
+) language sql stable security definer set search_path = public as $$
+    with dia as (
+        select
+            coalesce(sum(r.entregas), 0) as entregas,
+            count(distinct r.nome) as motoboys,
+            count(distinct r.nome) filter (where r.tipo = 'Fixo') as fixos
+        from resumo_diario_motoboys r
+        where r.data = p_data
+    ), custo as (
+        select d.*, d.fixos * cfg.valor_diaria + d.entregas * cfg.valor_corrida as custo
+        from dia d, configuracao_vigente() cfg
+    )
+    select
+        entregas,
+        motoboys,
+        case when motoboys > 0 then entregas::numeric / motoboys else 0 end,
+        custo,
+        case when entregas > 0 then custo / entregas else 0 end
+    from custo;
+$$;
+
+-- Consolidado por motoboy em um intervalo de datas (relatório semanal e afins)
+create or replace function relatorio_periodo(p_inicio date, p_fim date)
+returns table (
+    nome text,
+    tipo text,
+    dias_trabalhados bigint,
+    total_entregas bigint,
+    valor_devido numeric
+) language sql stable security definer set search_path = public as $$
+    select
+        r.nome,
+        r.tipo,
+        count(distinct r.data),
+        sum(r.entregas),
+        case when r.tipo = 'Fixo' then count(distinct r.data) * cfg.valor_diaria else 0 end
+            + sum(r.entregas) * cfg.valor_corrida
+    from resumo_diario_motoboys r, configuracao_vigente() cfg
+    where r.data between p_inicio and p_fim
+    group by r.nome, r.tipo, cfg.valor_diaria, cfg.valor_corrida
+    order by sum(r.entregas) desc, r.nome;
+$$;
@@ -0,0 +1,17 @@
+-- Publica as alterações de `registros` no Supabase Realtime, consumidas pelo
+-- feed de alterações do app (feed_registros.py). Com replica identity full,
+-- eventos de DELETE e UPDATE trazem também o registro anterior.
+
+alter table registros replica identity full;
+
+-- A tabela pode já ter sido adicionada pelo painel do Supabase
+do $$
+begin
+    if not exists (
+        select 1 from pg_publication_tables
+        where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = 'registros'
+    ) then
+        alter publication supabase_realtime add table registros;
+    end if;
+end;
+$$;
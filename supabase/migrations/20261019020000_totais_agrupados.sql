@@ -0,0 +1,45 @@
+-- Totais do resumo diário agrupados por dia, semana, mês, turno ou tipo,
+-- usados pelas ferramentas de consulta do assistente de IA. A filtragem por
+-- intervalo usa a chave primária de resumo_diario_motoboys (data na frente).
+--
+-- A diária do fixo é por dia trabalhado: quando o dia tem mais de uma linha
+-- (dois turnos, por exemplo), ela é dividida entre as linhas, para que
+-- qualquer agrupamento, inclusive por turno, some o custo certo.
+--
+-- Como as demais leituras do resumo, roda como `security definer`: a tabela
+-- é fechada para anon e authenticated.
+
+create or replace function totais_agrupados(p_inicio date, p_fim date, p_agrupamento text default 'dia')
+returns table (
+    grupo text,
+    registros bigint,
+    entregas bigint,
+    motoboys bigint,
+    custo numeric
+) language sql stable security definer set search_path = public as $$
+    with linhas as (
+        select
+            r.*,
+            case when r.tipo = 'Fixo'
+                then cfg.valor_diaria / count(*) over (partition by r.data, r.nome, r.tipo)
+                else 0
+            end + r.entregas * cfg.valor_corrida as custo
+        from resumo_diario_motoboys r, configuracao_vigente() cfg
+        where r.data between p_inicio and p_fim
+    )
+    select
+        case p_agrupamento
+            when 'semana' then to_char(date_trunc('week', r.data), 'YYYY-MM-DD')
+            when 'mes' then to_char(r.data, 'YYYY-MM')
+            when 'turno' then r.periodo
+            when 'tipo' then r.tipo
+            else to_char(r.data, 'YYYY-MM-DD')
+        end as grupo,
+        sum(r.registros),
+        sum(r.entregas),
+        count(distinct r.nome),
+        sum(r.custo)
+    from linhas r
+    group by 1
+    order by 1;
+$$;
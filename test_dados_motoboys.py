@@ -0,0 +1,72 @@
+"""
+Testes da importação em lote do Sistema de Controle de Motoboys
+
+dados_motoboys depende do módulo local `database` (fora do repositório) e
+do cliente do Supabase; sem eles os testes são pulados.
+"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+try:
+    import dados_motoboys as dados
+except ImportError as e:
+    pytest.skip(f"dependências do app indisponíveis: {e}", allow_module_level=True)
+
+
+def lote(datas):
+    return pd.DataFrame({
+        "nome": ["Ana"] * len(datas),
+        "data": datas,
+        "periodo": ["Manhã"] * len(datas),
+        "tipo": ["Fixo"] * len(datas),
+        "entregas": [3] * len(datas)
+    })
+
+
+def test_converter_datas_le_iso_sem_inverter_dia_e_mes():
+    datas = dados.converter_datas(pd.Series(["2026-10-05", " 2026-12-31 "]))
+    assert list(datas.dt.date) == [date(2026, 10, 5), date(2026, 12, 31)]
+
+
+def test_converter_datas_le_dia_mes_ano():
+    datas = dados.converter_datas(pd.Series(["05/10/2026", "31/12/2026"]))
+    assert list(datas.dt.date) == [date(2026, 10, 5), date(2026, 12, 31)]
+
+
+def test_converter_datas_aceita_datas_prontas_e_marca_invalidas():
+    datas = dados.converter_datas(pd.Series([date(2026, 10, 5), "10/05", None], dtype=object))
+    assert datas.iloc[0].date() == date(2026, 10, 5)
+    assert datas.iloc[1:].isna().all()
+
+
+def test_validar_registros_lote_com_os_dois_formatos():
+    registros, erros = dados.validar_registros_lote(lote(["2026-10-05", "05/10/2026"]))
+    assert erros == []
+    assert [r["data"] for r in registros] == ["2026-10-05", "2026-10-05"]
+
+
+def test_normalizar_planilha_lote_com_os_dois_formatos():
+    df = dados.normalizar_planilha_lote(lote(["2026-10-05", "05/10/2026"]))
+    assert list(df["data"]) == [date(2026, 10, 5), date(2026, 10, 5)]
+
+
+def test_validar_registros_lote_numera_erros_pela_grade():
+    df = lote(["2026-10-05", None, "31/02/2026"])
+    df.loc[1] = None  # Linha vazia no meio: ignorada, mas conta na numeração
+    registros, erros = dados.validar_registros_lote(df)
+    assert len(registros) == 1
+    assert erros == ["Linha 3 da grade: data inválida"]
+
+
+def test_validar_registros_lote_rejeita_entregas_infinitas():
+    df = lote(["2026-10-05", "2026-10-05"])
+    df["entregas"] = ["inf", float("-inf")]
+    registros, erros = dados.validar_registros_lote(df)
+    assert registros == []
+    assert erros == [
+        "Linha 1 da grade: entregas deve ser um inteiro ≥ 0",
+        "Linha 2 da grade: entregas deve ser um inteiro ≥ 0"
+    ]